@@ -0,0 +1,266 @@
+"""Memory-mapped banks of pre-generated puzzles.
+
+A bank file is a fixed header, any number of segments of fixed-size packed
+records, and a segment index::
+
+    header   magic, version, segment count, index offset
+    records  solution digits (minus one) packed at the minimum bit width,
+             followed by a one-bit-per-cell mask of the givens
+    index    (grid size, difficulty, record count, offset) per segment
+
+Every segment holds records of a single grid size and difficulty, so picking
+a random puzzle is a lookup in the index plus one read of a few bytes from
+the mapping.  Appending writes the new records and a new index after the old
+one and only then repoints the header, so a reader never sees a half-written
+bank.
+"""
+import argparse
+import bisect
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from typing import BinaryIO, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from generator import DIFFICULTY_NAMES, PuzzleGenerator
+from generator import parse_difficulty as _parse_difficulty
+from grids import MAX_CANONICAL_SIZE, unique_puzzles
+
+MAGIC = b'SDKBANK\0'
+VERSION = 1
+HEADER = struct.Struct('<8sHHIQ8x')
+SEGMENT = struct.Struct('<BBHIQ')
+
+
+def digit_bits(size: int) -> int:
+    """Get the number of bits needed to store one solution digit"""
+    return max(1, (size - 1).bit_length())
+
+
+def record_size(size: int) -> int:
+    """Get the packed size in bytes of one puzzle of a grid size"""
+    cells = size * size
+    return (cells * digit_bits(size) + cells + 7) // 8
+
+
+def pack_puzzle(puzzle: Sequence[int], solution: Sequence[int], size: int) -> bytes:
+    """Pack a flat puzzle and its solution into one bank record"""
+    bits = digit_bits(size)
+    cells = size * size
+    value = 0
+    for pos in range(cells - 1, -1, -1):
+        value = (value << bits) | (solution[pos] - 1)
+    mask = 0
+    for pos in range(cells):
+        if puzzle[pos] != 0:
+            mask |= 1 << pos
+    value = (value << cells) | mask
+    return value.to_bytes(record_size(size), 'little')
+
+
+def unpack_puzzle(record: bytes, size: int) -> Tuple[List[int], List[int]]:
+    """Unpack a bank record into flat (puzzle, solution) lists"""
+    bits = digit_bits(size)
+    cells = size * size
+    value = int.from_bytes(record, 'little')
+    mask = value & ((1 << cells) - 1)
+    value >>= cells
+    digit_mask = (1 << bits) - 1
+    solution = []
+    for _ in range(cells):
+        solution.append((value & digit_mask) + 1)
+        value >>= bits
+    puzzle = [num if mask >> pos & 1 else 0 for pos, num in enumerate(solution)]
+    return puzzle, solution
+
+
+class PuzzleBank:
+    """Read-only view of a bank file through mmap"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is not a puzzle bank")
+        self._segments: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        self._totals: Dict[Tuple[int, int], List[int]] = {}
+        for size, difficulty, count, offset in read_index(self._map):
+            key = (size, difficulty)
+            segments = self._segments.setdefault(key, [])
+            totals = self._totals.setdefault(key, [])
+            segments.append((offset, count))
+            totals.append((totals[-1] if totals else 0) + count)
+
+    def close(self):
+        """Release the mapping and the file"""
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> 'PuzzleBank':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def keys(self) -> List[Tuple[int, int]]:
+        """Get the (grid size, difficulty) pairs stored in the bank"""
+        return sorted(self._segments)
+
+    def count(self, size: int, difficulty: int) -> int:
+        """Get the number of puzzles of a grid size and difficulty"""
+        totals = self._totals.get((size, difficulty))
+        return totals[-1] if totals else 0
+
+    def get(self, size: int, difficulty: int, index: int) -> Tuple[List[int], List[int]]:
+        """Read one puzzle as flat (puzzle, solution) lists"""
+        key = (size, difficulty)
+        totals = self._totals.get(key)
+        if not totals or not 0 <= index < totals[-1]:
+            raise IndexError(f"no puzzle {index} for size {size} difficulty {difficulty}")
+        segment = bisect.bisect_right(totals, index)
+        offset, _ = self._segments[key][segment]
+        if segment:
+            index -= totals[segment - 1]
+        length = record_size(size)
+        start = offset + index * length
+        return unpack_puzzle(self._map[start:start + length], size)
+
+    def segment_data(self, size: int, difficulty: int) -> List[memoryview]:
+        """Get zero-copy views of the packed records of one size and difficulty"""
+        length = record_size(size)
+        view = memoryview(self._map)
+        return [view[offset:offset + count * length]
+                for offset, count in self._segments.get((size, difficulty), [])]
+
+    def random_puzzle(self, size: int, difficulty: int,
+                      rng: random.Random) -> Optional[Tuple[List[int], List[int]]]:
+        """Pick a random puzzle, or None if the bank has none that match"""
+        count = self.count(size, difficulty)
+        if count == 0:
+            return None
+        return self.get(size, difficulty, rng.randrange(count))
+
+
+def read_index(data) -> List[Tuple[int, int, int, int]]:
+    """Parse the header and segment index of a bank"""
+    if len(data) < HEADER.size:
+        raise ValueError("puzzle bank is truncated")
+    magic, version, _, segment_count, index_offset = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("not a puzzle bank")
+    if version != VERSION:
+        raise ValueError(f"unsupported puzzle bank version {version}")
+    segments = []
+    for i in range(segment_count):
+        size, difficulty, _, count, offset = SEGMENT.unpack_from(
+            data, index_offset + i * SEGMENT.size)
+        segments.append((size, difficulty, count, offset))
+    return segments
+
+
+def append_puzzles(path: str, size: int, difficulty: int,
+                   puzzles: Iterable[Tuple[Sequence[int], Sequence[int]]]) -> int:
+    """Append puzzles to a bank as a new segment, creating the file if needed
+
+    Returns the number of puzzles written.
+    """
+    mode = 'r+b' if os.path.exists(path) else 'w+b'
+    with open(path, mode) as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            segments = []
+            f.write(HEADER.pack(MAGIC, VERSION, 0, 0, HEADER.size))
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                segments = read_index(data)
+
+        offset = f.tell()
+        count = 0
+        for puzzle, solution in puzzles:
+            f.write(pack_puzzle(puzzle, solution, size))
+            count += 1
+        if count:
+            segments.append((size, difficulty, count, offset))
+        _write_index(f, segments)
+    return count
+
+
+def _write_index(f: BinaryIO, segments: List[Tuple[int, int, int, int]]):
+    """Write a segment index at EOF and point the header at it"""
+    f.seek(0, os.SEEK_END)
+    index_offset = f.tell()
+    for size, difficulty, count, offset in segments:
+        f.write(SEGMENT.pack(size, difficulty, 0, count, offset))
+    f.flush()
+    os.fsync(f.fileno())
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, VERSION, 0, len(segments), index_offset))
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def parse_difficulty(value: str) -> int:
+    """Parse a --difficulty argument as a name or a level number"""
+    try:
+        return _parse_difficulty(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def build(args: argparse.Namespace) -> int:
+    """Generate puzzles and append them to a bank"""
+    generator = PuzzleGenerator(args.size)
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    puzzles = (generator.generate(args.difficulty, rng) for _ in range(args.count))
+    if args.unique:
+        puzzles = unique_puzzles(puzzles, args.size)
+    written = append_puzzles(args.path, args.size, args.difficulty, puzzles)
+    elapsed = time.perf_counter() - start
+    skipped = f", skipped {args.count - written} duplicates" if args.unique else ""
+    print(f"Appended {written} {DIFFICULTY_NAMES[args.difficulty]} {args.size}x{args.size} "
+          f"puzzles to {args.path} in {elapsed:.2f}s{skipped}")
+    return 0
+
+
+def info(args: argparse.Namespace) -> int:
+    """Print the contents of a bank"""
+    with PuzzleBank(args.path) as bank:
+        for size, difficulty in bank.keys():
+            print(f"{size}x{size} {DIFFICULTY_NAMES[difficulty]}: "
+                  f"{bank.count(size, difficulty)} puzzles")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build and inspect puzzle banks")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help="generate puzzles into a bank")
+    build_parser.add_argument('path')
+    build_parser.add_argument('--size', type=int, default=4)
+    build_parser.add_argument('--difficulty', type=parse_difficulty, default=1)
+    build_parser.add_argument('--count', type=int, default=1000)
+    build_parser.add_argument('--seed', type=int, default=None)
+    build_parser.add_argument('--unique', action='store_true',
+                              help="skip puzzles equivalent to one already generated "
+                                   f"(sizes up to {MAX_CANONICAL_SIZE})")
+    build_parser.set_defaults(func=build)
+
+    info_parser = commands.add_parser('info', help="list the puzzles in a bank")
+    info_parser.add_argument('path')
+    info_parser.set_defaults(func=info)
+
+    args = parser.parse_args(argv)
+    if args.command == 'build' and args.unique and args.size > MAX_CANONICAL_SIZE:
+        parser.error(f"--unique is only supported for sizes up to {MAX_CANONICAL_SIZE}")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
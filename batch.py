@@ -0,0 +1,156 @@
+"""Generate puzzles in bulk across a process pool.
+
+Each task generates a chunk of puzzles with its own seed drawn from the
+master seed, so the output for a given --seed is identical no matter how
+many workers run it.  Chunks are written in order as they complete, one
+``puzzle solution`` line per puzzle, and at most a few chunks per worker
+are in flight so memory stays flat for any --count.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from bank import parse_difficulty
+from board import box_size_of
+from generator import DIFFICULTY_NAMES, format_cells, generate_chunk
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class WorkerStats:
+    """Puzzles and busy time reported by one worker process"""
+
+    def __init__(self):
+        self.chunks = 0
+        self.puzzles = 0
+        self.busy = 0.0
+
+    def add(self, puzzles: int, busy: float):
+        self.chunks += 1
+        self.puzzles += puzzles
+        self.busy += busy
+
+
+def generate_lines(size: int, difficulty: int, seed: int,
+                   count: int) -> Tuple[str, int, int, float]:
+    """Generate a chunk of count puzzles as text lines
+
+    Returns the text, the worker pid, the number of puzzles and the time
+    spent generating them.
+    """
+    start = time.perf_counter()
+    lines = [f"{format_cells(puzzle)} {format_cells(solution)}\n"
+             for puzzle, solution, _ in generate_chunk(size, difficulty, seed, count)]
+    return ''.join(lines), os.getpid(), count, time.perf_counter() - start
+
+
+def run_batch(size: int, difficulty: int, count: int, out: TextIO,
+              workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+              seed: Optional[int] = None,
+              progress: Optional[TextIO] = None) -> Dict[int, WorkerStats]:
+    """Generate count puzzles into out, returning per-worker statistics"""
+    workers = workers or os.cpu_count() or 1
+    master = random.Random(seed)
+    stats: Dict[int, WorkerStats] = {}
+    start = time.perf_counter()
+    last_report = start
+    done = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        remaining = count
+        while remaining or pending:
+            # Keep a couple of chunks per worker queued, no more
+            while remaining and len(pending) < 2 * workers:
+                chunk = min(chunk_size, remaining)
+                remaining -= chunk
+                pending.append(executor.submit(
+                    generate_lines, size, difficulty, master.getrandbits(64), chunk))
+
+            text, pid, puzzles, busy = pending.popleft().result()
+            out.write(text)
+            stats.setdefault(pid, WorkerStats()).add(puzzles, busy)
+            done += puzzles
+
+            now = time.perf_counter()
+            if progress is not None and now - last_report >= 1.0:
+                last_report = now
+                rate = done / (now - start)
+                progress.write(f"{done}/{count} puzzles, {rate:.0f} puzzles/sec\n")
+                progress.flush()
+    out.flush()
+    return stats
+
+
+def report(stats: Dict[int, WorkerStats], elapsed: float, out: TextIO):
+    """Print overall throughput and a line per worker"""
+    total = sum(worker.puzzles for worker in stats.values())
+    rate = total / elapsed if elapsed > 0 else 0.0
+    out.write(f"Generated {total} puzzles in {elapsed:.2f}s "
+              f"({rate:.0f} puzzles/sec, {len(stats)} workers)\n")
+    for pid, worker in sorted(stats.items()):
+        worker_rate = worker.puzzles / worker.busy if worker.busy > 0 else 0.0
+        utilization = worker.busy / elapsed if elapsed > 0 else 0.0
+        out.write(f"  worker {pid}: {worker.puzzles} puzzles in {worker.chunks} chunks, "
+                  f"{worker_rate:.0f} puzzles/sec, {utilization:.0%} busy\n")
+
+
+def positive_int(value: str) -> int:
+    """Parse a count that must be at least one"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def grid_size(value: str) -> int:
+    """Parse a grid size, which must be a perfect square of at least 4"""
+    size = positive_int(value)
+    try:
+        box_size_of(size)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    if size < 4:
+        raise argparse.ArgumentTypeError(f"must be at least 4, got {size}")
+    return size
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate puzzles in parallel")
+    parser.add_argument('--count', type=positive_int, default=10000)
+    parser.add_argument('--size', type=grid_size, default=4)
+    parser.add_argument('--difficulty', type=parse_difficulty, default=1,
+                        help=f"one of {', '.join(DIFFICULTY_NAMES)} or a level number")
+    parser.add_argument('--workers', type=positive_int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument('--chunk-size', type=positive_int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', default='-', help="output file, or - for stdout")
+    parser.add_argument('--quiet', action='store_true', help="skip progress and statistics")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    progress = None if args.quiet else sys.stderr
+    start = time.perf_counter()
+    try:
+        stats = run_batch(args.size, args.difficulty, args.count, out,
+                          workers=args.workers, chunk_size=args.chunk_size,
+                          seed=args.seed, progress=progress)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if progress is not None:
+        report(stats, time.perf_counter() - start, progress)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+"""Performance benchmarks for the engine, generator and renderer.
+
+Run from the repository root::
+
+    python -m benchmarks                      # measure and compare
+    python -m benchmarks --save-baseline      # record a new baseline
+    python -m benchmarks --sizes 4 9 16 --output results.json
+
+Every benchmark is warmed up, then timed for a number of repeats, each
+long enough for the clock to resolve.  Results hold per-call percentiles
+in microseconds and are compared against ``baseline.json``; a benchmark
+whose median slows down by more than its threshold fails the run.
+"""
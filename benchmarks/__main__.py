@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.cases import engine_cases, frame_cases
+from benchmarks.harness import (DEFAULT_REPEATS, DEFAULT_THRESHOLD, DEFAULT_WARMUP,
+                                compare, measure)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def parse_threshold(value: str) -> Tuple[str, float]:
+    """Parse a NAME=FRACTION per-benchmark threshold"""
+    name, sep, fraction = value.partition('=')
+    try:
+        if not sep:
+            raise ValueError
+        return name, float(fraction)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected NAME=FRACTION, got {value!r}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description="Run the performance benchmarks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 9],
+                        help="grid sizes for the engine benchmarks")
+    parser.add_argument('--filter', default='', help="only run benchmarks containing this text")
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP)
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-frame', action='store_true', help="skip the pygame frame benchmark")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="store the results as the new baseline instead of comparing")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed median slowdown as a fraction (default %(default)s)")
+    parser.add_argument('--threshold-for', type=parse_threshold, action='append', default=[],
+                        metavar='NAME=FRACTION', help="override the threshold of one benchmark")
+    args = parser.parse_args(argv)
+
+    cases = []
+    for size in args.sizes:
+        cases.extend(engine_cases(size, args.seed))
+    if not args.no_frame:
+        cases.extend(frame_cases(args.seed))
+
+    results = []
+    print(f"{'benchmark':32} {'p50 us':>12} {'p95 us':>12} {'p99 us':>12}")
+    for name, func in cases:
+        if args.filter not in name:
+            continue
+        result = measure(name, func, args.warmup, args.repeats)
+        results.append(result)
+        print(f"{name:32} {result.p50:12.2f} {result.p95:12.2f} {result.p99:12.2f}")
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': {result.name: result.to_json() for result in results},
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline: Dict[str, Dict[str, float]] = json.load(f)['results']
+    regressions = compare(results, baseline, dict(args.threshold_for), args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    if regressions:
+        print(f"{len(regressions)} of {len(results)} benchmarks regressed", file=sys.stderr)
+        return 1
+    print(f"All {len(results)} benchmarks within threshold of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
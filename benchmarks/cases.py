@@ -0,0 +1,65 @@
+import os
+import random
+from typing import Callable, Iterator, Tuple
+
+# The frame benchmark needs no window; this must precede the pygame import
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from engine import GRID_SIZE, SudokuEngine
+
+Case = Tuple[str, Callable[[], object]]
+
+
+def engine_cases(size: int, seed: int) -> Iterator[Case]:
+    """Benchmarks of puzzle generation and the rules at one grid size"""
+    # The generator's rng is rewound before every call so each does identical work
+    generating = SudokuEngine(size, rng=random.Random(seed))
+    state = generating.rng.getstate()
+
+    def generate_complete_board():
+        generating.rng.setstate(state)
+        return generating.generate_complete_board()
+
+    def generate_new_puzzle():
+        generating.rng.setstate(state)
+        generating.generate_new_puzzle()
+
+    yield f'generate_complete_board[{size}]', generate_complete_board
+    yield f'generate_new_puzzle[{size}]', generate_new_puzzle
+
+    engine = SudokuEngine(size, rng=random.Random(seed))
+    pos = engine.board.cells.index(0)
+    row, col = divmod(pos, size)
+    num = engine.solution[row, col]
+    yield f'is_valid_move[{size}]', lambda: engine.is_valid_move(row, col, num)
+
+    # A digit that clashes with a given in the same row
+    wrong = next(value for value in engine.board.row(row) if value)
+    engine.set_cell(row, col, wrong)
+    yield f'get_conflicts[{size}]', lambda: engine.get_conflicts(row, col, wrong)
+    yield f'check_win[{size}]', engine.check_win
+
+
+def frame_cases(seed: int) -> Iterator[Case]:
+    """Benchmark of one full frame of the game window
+
+    The window layout is fixed at GRID_SIZE, so this runs at that size only.
+    """
+    import pygame
+    from sudoku import MiniSudoku
+
+    game = MiniSudoku()
+    game.engine.rng = random.Random(seed)
+    game.engine.reset_game()
+    game.palette_rects = {}
+    game.restart_button = None
+    game.solution_button = None
+    game.new_button = None
+    game.selected_cell = divmod(game.engine.board.cells.index(0), GRID_SIZE)
+
+    def frame():
+        game.draw()
+        pygame.display.flip()
+
+    yield f'draw[{GRID_SIZE}]', frame
@@ -0,0 +1,83 @@
+import time
+from typing import Callable, Dict, List, NamedTuple, Sequence
+
+# Every timed repeat runs the benchmark at least this long
+MIN_REPEAT_TIME = 0.02
+DEFAULT_WARMUP = 3
+DEFAULT_REPEATS = 30
+# Loose enough for shared machines; tighten with --threshold on quiet ones
+DEFAULT_THRESHOLD = 0.5
+
+
+class Result(NamedTuple):
+    """Per-call timings of one benchmark, in microseconds"""
+    name: str
+    calls: int
+    mean: float
+    p50: float
+    p95: float
+    p99: float
+    min: float
+    max: float
+
+    def to_json(self) -> Dict[str, float]:
+        return {'calls': self.calls, 'mean': self.mean, 'p50': self.p50, 'p95': self.p95,
+                'p99': self.p99, 'min': self.min, 'max': self.max}
+
+
+def percentile(samples: Sequence[float], fraction: float) -> float:
+    """Interpolate a percentile of sorted samples"""
+    if not samples:
+        raise ValueError("no samples")
+    index = (len(samples) - 1) * fraction
+    low = int(index)
+    high = min(low + 1, len(samples) - 1)
+    return samples[low] + (samples[high] - samples[low]) * (index - low)
+
+
+def calls_per_repeat(func: Callable[[], object]) -> int:
+    """Find how many calls make one repeat last at least MIN_REPEAT_TIME"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - start >= MIN_REPEAT_TIME:
+            return number
+        number *= 2
+
+
+def measure(name: str, func: Callable[[], object], warmup: int = DEFAULT_WARMUP,
+            repeats: int = DEFAULT_REPEATS) -> Result:
+    """Time a benchmark, reporting the spread of its per-call time"""
+    for _ in range(warmup):
+        func()
+    number = calls_per_repeat(func)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number * 1e6)
+    samples.sort()
+    return Result(name, number * repeats, sum(samples) / len(samples),
+                  percentile(samples, 0.50), percentile(samples, 0.95),
+                  percentile(samples, 0.99), samples[0], samples[-1])
+
+
+def compare(results: List[Result], baseline: Dict[str, Dict[str, float]],
+            thresholds: Dict[str, float],
+            default_threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """Describe every benchmark whose median regressed past its threshold"""
+    regressions = []
+    for result in results:
+        reference = baseline.get(result.name)
+        if reference is None:
+            continue
+        threshold = thresholds.get(result.name, default_threshold)
+        slowdown = result.p50 / reference['p50'] - 1
+        if slowdown > threshold:
+            regressions.append(f"{result.name}: median {result.p50:.2f}us vs baseline "
+                               f"{reference['p50']:.2f}us (+{slowdown:.0%}, "
+                               f"threshold {threshold:.0%})")
+    return regressions
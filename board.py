@@ -0,0 +1,123 @@
+import math
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+
+def box_size_of(size: int) -> int:
+    """Get the side of a grid's boxes, rejecting sizes that are not squares"""
+    box_size = math.isqrt(size)
+    if box_size * box_size != size:
+        raise ValueError(f"grid size must be a perfect square, got {size}")
+    return box_size
+
+
+def box_index(row: int, col: int, box_size: int) -> int:
+    """Get the index of the box containing a cell"""
+    return (row // box_size) * box_size + col // box_size
+
+
+class Board:
+    """A Sudoku board packed one byte per cell.
+
+    Cells are stored row-major in a ``bytearray``, so a board is a flat
+    sequence of ints that the solvers, grader and text and bank formats
+    accept directly.  Index it with ``board[pos]`` for a flat position or
+    ``board[row, col]`` for a cell; ``row``, ``col`` and ``box`` slice a
+    whole unit at C speed.  Copies, equality and hashing all work on the
+    raw bytes, and ``view`` exports them without copying.
+
+    A board hashes by its current contents, so one used as a dict key or
+    set member must not be changed afterwards; key on a copy instead.
+    """
+
+    __slots__ = ('size', 'box_size', 'cells')
+
+    def __init__(self, size: int, cells: Optional[Sequence[int]] = None):
+        box_size = box_size_of(size)
+        self.size = size
+        self.box_size = box_size
+        if cells is None:
+            self.cells = bytearray(size * size)
+        else:
+            self.cells = bytearray(cells.cells if isinstance(cells, Board) else cells)
+            if len(self.cells) != size * size:
+                raise ValueError(f"expected {size * size} cells, got {len(self.cells)}")
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[int]]) -> 'Board':
+        """Build a board from a list of rows"""
+        return cls(len(rows), [num for row in rows for num in row])
+
+    def to_rows(self) -> List[List[int]]:
+        """Get the board as a list of rows"""
+        size = self.size
+        return [list(self.cells[row * size:(row + 1) * size]) for row in range(size)]
+
+    def copy(self) -> 'Board':
+        """Copy the board without revalidating it"""
+        board = Board.__new__(Board)
+        board.size = self.size
+        board.box_size = self.box_size
+        board.cells = self.cells[:]
+        return board
+
+    def view(self) -> memoryview:
+        """Get a zero-copy view of the cells, e.g. for numpy.frombuffer"""
+        return memoryview(self.cells)
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.cells)
+
+    def __getitem__(self, index: Union[int, Tuple[int, int]]) -> int:
+        if isinstance(index, tuple):
+            row, col = index
+            return self.cells[row * self.size + col]
+        return self.cells[index]
+
+    def __setitem__(self, index: Union[int, Tuple[int, int]], num: int):
+        if isinstance(index, tuple):
+            row, col = index
+            self.cells[row * self.size + col] = num
+        else:
+            self.cells[index] = num
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Board):
+            return NotImplemented
+        return self.size == other.size and self.cells == other.cells
+
+    def __hash__(self) -> int:
+        return hash((self.size, bytes(self.cells)))
+
+    def __repr__(self) -> str:
+        return f"Board({self.size}, {list(self.cells)!r})"
+
+    def box_index(self, row: int, col: int) -> int:
+        """Get the index of the box containing a cell"""
+        return box_index(row, col, self.box_size)
+
+    def row(self, row: int) -> bytearray:
+        """Get the digits of a row"""
+        size = self.size
+        return self.cells[row * size:(row + 1) * size]
+
+    def col(self, col: int) -> bytearray:
+        """Get the digits of a column"""
+        return self.cells[col::self.size]
+
+    def box(self, box: int) -> bytearray:
+        """Get the digits of a box in row-major order"""
+        size, box_size = self.size, self.box_size
+        start = (box // box_size) * box_size * size + (box % box_size) * box_size
+        return bytearray().join(self.cells[start + i * size:start + i * size + box_size]
+                                for i in range(box_size))
+
+    def filled(self) -> int:
+        """Count the non-empty cells"""
+        return len(self.cells) - self.cells.count(0)
+
+    def diff(self, other: 'Board') -> List[int]:
+        """Get the flat positions where two boards differ"""
+        return [pos for pos, (a, b) in enumerate(zip(self.cells, other.cells)) if a != b]
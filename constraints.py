@@ -0,0 +1,126 @@
+from typing import Sequence
+
+from board import box_index
+
+
+class ConstraintTracker:
+    """Incremental row, column and box bookkeeping for a Sudoku board.
+
+    Every unit keeps a bitmask of the digits it contains plus a per-digit
+    count, so placing or clearing a cell, validating a move and checking
+    for a win are all constant time regardless of the grid size.
+    ``conflicts`` counts surplus copies of a digit within a unit; a full
+    board with zero conflicts is solved.
+    """
+
+    def __init__(self, size: int, box_size: int):
+        self.size = size
+        self.box_size = box_size
+        self.full_mask = (1 << (size + 1)) - 2
+        self.clear()
+
+    def clear(self):
+        """Forget every placed digit"""
+        size = self.size
+        self.row_masks = [0] * size
+        self.col_masks = [0] * size
+        self.box_masks = [0] * size
+        self.row_counts = [0] * (size * (size + 1))
+        self.col_counts = [0] * (size * (size + 1))
+        self.box_counts = [0] * (size * (size + 1))
+        self.filled = 0
+        self.conflicts = 0
+
+    def load(self, cells: Sequence[int]):
+        """Rebuild the tracker from a flat row-major board"""
+        self.clear()
+        size = self.size
+        for pos, num in enumerate(cells):
+            if num != 0:
+                self.place(pos // size, pos % size, num)
+
+    def place(self, row: int, col: int, num: int):
+        """Record a digit written into an empty cell"""
+        stride = self.size + 1
+        bit = 1 << num
+        box = box_index(row, col, self.box_size)
+
+        i = row * stride + num
+        count = self.row_counts[i]
+        if count:
+            self.conflicts += 1
+        else:
+            self.row_masks[row] |= bit
+        self.row_counts[i] = count + 1
+
+        i = col * stride + num
+        count = self.col_counts[i]
+        if count:
+            self.conflicts += 1
+        else:
+            self.col_masks[col] |= bit
+        self.col_counts[i] = count + 1
+
+        i = box * stride + num
+        count = self.box_counts[i]
+        if count:
+            self.conflicts += 1
+        else:
+            self.box_masks[box] |= bit
+        self.box_counts[i] = count + 1
+
+        self.filled += 1
+
+    def remove(self, row: int, col: int, num: int):
+        """Record a digit cleared from a cell"""
+        stride = self.size + 1
+        bit = 1 << num
+        box = box_index(row, col, self.box_size)
+
+        i = row * stride + num
+        count = self.row_counts[i] - 1
+        self.row_counts[i] = count
+        if count:
+            self.conflicts -= 1
+        else:
+            self.row_masks[row] &= ~bit
+
+        i = col * stride + num
+        count = self.col_counts[i] - 1
+        self.col_counts[i] = count
+        if count:
+            self.conflicts -= 1
+        else:
+            self.col_masks[col] &= ~bit
+
+        i = box * stride + num
+        count = self.box_counts[i] - 1
+        self.box_counts[i] = count
+        if count:
+            self.conflicts -= 1
+        else:
+            self.box_masks[box] &= ~bit
+
+        self.filled -= 1
+
+    def is_valid(self, row: int, col: int, num: int, current: int = 0) -> bool:
+        """Check that no other cell in the cell's units holds num
+
+        ``current`` is the digit already in the cell, which is not counted
+        against itself.
+        """
+        allowed = 1 if current == num else 0
+        stride = self.size + 1
+        return (self.row_counts[row * stride + num] <= allowed
+                and self.col_counts[col * stride + num] <= allowed
+                and self.box_counts[box_index(row, col, self.box_size) * stride + num] <= allowed)
+
+    def candidates(self, row: int, col: int) -> int:
+        """Get the bitmask of digits not yet used by the cell's units"""
+        used = (self.row_masks[row] | self.col_masks[col]
+                | self.box_masks[box_index(row, col, self.box_size)])
+        return self.full_mask & ~used
+
+    def is_solved(self) -> bool:
+        """Check if every cell is filled without conflicts"""
+        return self.filled == self.size * self.size and self.conflicts == 0
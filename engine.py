@@ -0,0 +1,338 @@
+import random
+import time
+from array import array
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from board import Board, box_size_of
+from constraints import ConstraintTracker
+from generator import (DIFFICULTY_NAMES, PUZZLE_ID_SIZES, PuzzleGenerator, format_puzzle_id,
+                       new_seed, parse_puzzle_id, puzzle_from_id)
+from grids import ENUMERABLE_SIZES
+from journal import HINT, PENCIL, MoveJournal
+from solver import DancingLinksSolver, Solver
+
+# Constants for 4x4 Mini Sudoku
+GRID_SIZE = 4
+MAX_MISTAKES = 3
+
+# Returns a flat (puzzle, solution) pair for (size, difficulty, rng), or None;
+# a third item, if present, is the puzzle's ID
+PuzzleSource = Callable[[int, int, random.Random], Optional[Tuple[Sequence[int], ...]]]
+
+# Game events reported to SudokuEngine.event_hook as (kind, row, col, num)
+EVENT_PUZZLE = 0
+EVENT_MOVE = 1
+EVENT_HINT = 2
+EVENT_PENCIL = 3
+EVENT_UNDO = 4
+EVENT_REDO = 5
+EVENT_RESET = 6
+EVENT_SOLUTION = 7
+EventHook = Callable[[int, int, int, int], None]
+
+
+class SudokuEngine:
+    """Headless game state and rules for Mini Sudoku.
+
+    Holds the board, solution and player progress without touching pygame,
+    so puzzles can be generated, validated and played from worker processes
+    or tests with no display.
+    """
+
+    def __init__(self, size: int = GRID_SIZE, solver: Optional[Solver] = None,
+                 rng: Optional[random.Random] = None,
+                 difficulty: Optional[int] = None,
+                 puzzle_source: Optional[PuzzleSource] = None,
+                 event_hook: Optional[EventHook] = None):
+        box_size = box_size_of(size)
+        self.size = size
+        self.box_size = box_size
+        self.constraints = ConstraintTracker(size, box_size)
+        self.solver = solver if solver is not None else DancingLinksSolver(size)
+        self.generator = PuzzleGenerator(size, solver=self.solver)
+        # IDs only cover PUZZLE_ID_SIZES and name puzzles of the default
+        # generator; another solver builds other complete boards from the
+        # same seed once sizes outgrow the enumerated grid table
+        self.ids_reproducible = size in PUZZLE_ID_SIZES and (
+            type(self.solver) is DancingLinksSolver or size in ENUMERABLE_SIZES)
+        self.rng = rng if rng is not None else random.Random()
+        # None picks a random difficulty level for every new puzzle
+        self.difficulty = difficulty
+        # Consulted before generating, e.g. PuzzleBank.random_puzzle
+        self.puzzle_source = puzzle_source
+        # Told about every state change, e.g. SessionRecorder.record
+        self.event_hook = event_hook
+        self.journal = MoveJournal()
+        self.reset_game()
+
+    def reset_game(self):
+        """Reset the game state"""
+        size = self.size
+        self.board = Board(size)
+        self.solution = Board(size)
+        self.original_board = Board(size)
+        self.reset_progress()
+        self.generate_new_puzzle()
+
+    def start_puzzle(self, puzzle: Sequence[int], solution: Sequence[int],
+                     puzzle_id: Optional[str] = None):
+        """Start a fresh game on a given puzzle"""
+        self.reset_progress()
+        self.load_puzzle(puzzle, solution, puzzle_id)
+
+    def reset_progress(self):
+        """Reset the mistakes, timer and game status"""
+        self.mistakes = 0
+        self.max_mistakes = MAX_MISTAKES
+        # (row, col, technique) of the last hint; technique is None for a reveal
+        self.last_hint = None
+        self.game_over = False
+        self.game_won = False
+        self.start_time = time.time()
+        self.elapsed_time = 0
+
+    def generate_new_puzzle(self):
+        """Generate a new Sudoku puzzle with exactly one solution
+
+        Each puzzle is generated from its own seed drawn from ``rng``, so
+        it can be regenerated later from ``puzzle_id`` unless the engine
+        uses a solver other than the default.
+        """
+        difficulty = self.difficulty
+        if difficulty is None:
+            difficulty = self.rng.randrange(len(DIFFICULTY_NAMES))
+        puzzle = None
+        if self.puzzle_source is not None:
+            puzzle = self.puzzle_source(self.size, difficulty, self.rng)
+        if puzzle is None:
+            seed = new_seed(self.rng)
+            puzzle, solution = self.generator.generate(difficulty, random.Random(seed))
+            puzzle_id = (format_puzzle_id(self.size, difficulty, seed)
+                         if self.ids_reproducible else None)
+            puzzle = (puzzle, solution, puzzle_id)
+        self.load_puzzle(*puzzle)
+
+    def start_puzzle_id(self, puzzle_id: str):
+        """Start a fresh game on the puzzle an ID names"""
+        parsed = parse_puzzle_id(puzzle_id)
+        if parsed.size != self.size:
+            raise ValueError(f"puzzle {puzzle_id} is not a {self.size}x{self.size} puzzle")
+        # Kept as format_puzzle_id writes it, however it was typed
+        puzzle_id = format_puzzle_id(*parsed)
+        # Always the default generator, which is what IDs name
+        puzzle = puzzle_from_id(puzzle_id)
+        self.reset_progress()
+        self.load_puzzle(*puzzle, puzzle_id)
+
+    def load_puzzle(self, puzzle: Sequence[int], solution: Sequence[int],
+                    puzzle_id: Optional[str] = None):
+        """Start playing a puzzle given as flat row-major cell lists"""
+        self.solution = Board(self.size, solution)
+        self.board = Board(self.size, puzzle)
+        self.original_board = self.board.copy()
+        # None when the puzzle did not come from a seed, e.g. from a bank
+        self.puzzle_id = puzzle_id
+        self.constraints.load(self.board)
+        self.clear_history()
+        self.emit(EVENT_PUZZLE)
+
+    def emit(self, kind: int, row: int = 0, col: int = 0, num: int = 0):
+        """Report a game event to the event hook"""
+        if self.event_hook is not None:
+            self.event_hook(kind, row, col, num)
+
+    def clear_history(self):
+        """Drop the undo history and every pencil mark"""
+        self.journal.clear()
+        # Candidate notes, one mask per cell with bit num set for digit num
+        self.pencil_marks = array('L', [0]) * (self.size * self.size)
+
+    def generate_complete_board(self) -> Board:
+        """Generate a complete valid Sudoku board"""
+        return self.generator.complete_board(self.rng)
+
+    def is_valid_move(self, row: int, col: int, num: int) -> bool:
+        """Check if a move is valid"""
+        return self.constraints.is_valid(row, col, num,
+                                         self.board.cells[row * self.size + col])
+
+    def check_win(self) -> bool:
+        """Check if the board is complete and correct"""
+        return self.constraints.is_solved()
+
+    def get_conflicts(self, row: int, col: int, num: int) -> List[Tuple[int, int]]:
+        """Get all conflicting cells for a number"""
+        conflicts = []
+
+        if num == 0 or self.is_valid_move(row, col, num):
+            return conflicts
+
+        board = self.board
+
+        # Check row
+        for c, value in enumerate(board.row(row)):
+            if value == num and c != col:
+                conflicts.append((row, c))
+
+        # Check column
+        for r, value in enumerate(board.col(col)):
+            if value == num and r != row:
+                conflicts.append((r, col))
+
+        # Check box
+        box_size = self.box_size
+        box_row = (row // box_size) * box_size
+        box_col = (col // box_size) * box_size
+        for i, value in enumerate(board.box(board.box_index(row, col))):
+            r = box_row + i // box_size
+            c = box_col + i % box_size
+            if value == num and (r != row or c != col):
+                conflicts.append((r, c))
+
+        return conflicts
+
+    def set_cell(self, row: int, col: int, num: int):
+        """Write a digit into a cell, keeping the constraints in sync"""
+        pos = row * self.size + col
+        cells = self.board.cells
+        old_num = cells[pos]
+        if old_num == num:
+            return
+        if old_num != 0:
+            self.constraints.remove(row, col, old_num)
+        cells[pos] = num
+        if num != 0:
+            self.constraints.place(row, col, num)
+
+    def is_editable(self, row: int, col: int) -> bool:
+        """Check if a cell can be changed by the player"""
+        return self.original_board[row, col] == 0
+
+    def make_move(self, row: int, col: int, num: int):
+        """Make a move on the board"""
+        if self.original_board[row, col] != 0:
+            return
+
+        old_num = self.board[row, col]
+        if old_num != num:
+            self.journal.record(row * self.size + col, old_num, num)
+        self.set_cell(row, col, num)
+
+        # Check if move is valid
+        if num != 0 and not self.is_valid_move(row, col, num):
+            self.mistakes += 1
+            if self.mistakes >= self.max_mistakes:
+                self.game_over = True
+
+        # Check for win
+        if self.check_win():
+            self.game_won = True
+        self.emit(EVENT_MOVE, row, col, num)
+
+    def provide_hint(self):
+        """Provide a hint by filling in the next cell logic can deduce
+
+        Wrong entries are ignored while deducing, so a hint may correct
+        one.  If logic alone cannot place anything, a random unsolved cell
+        is revealed from the solution instead.
+        """
+        if self.game_over or self.game_won:
+            return
+
+        size = self.size
+        cells = [num if num == solved else 0
+                 for num, solved in zip(self.board.cells, self.solution.cells)]
+        step = self.generator.grader.hint(cells)
+        if step is not None:
+            row, col = divmod(step.pos, size)
+            self.last_hint = (row, col, step.technique)
+        else:
+            unsolved_cells = [(pos // size, pos % size)
+                              for pos, num in enumerate(cells) if num == 0]
+            if not unsolved_cells:
+                return
+            row, col = self.rng.choice(unsolved_cells)
+            self.last_hint = (row, col, None)
+        self.reveal(row, col)
+
+    def reveal(self, row: int, col: int):
+        """Fill a cell from the solution as a hint"""
+        num = self.solution[row, col]
+        self.journal.record(row * self.size + col, self.board[row, col], num, HINT)
+        self.set_cell(row, col, num)
+
+        # Check for win
+        if self.check_win():
+            self.game_won = True
+        self.emit(EVENT_HINT, row, col, num)
+
+    def toggle_pencil(self, row: int, col: int, num: int):
+        """Add or remove a pencil mark in an editable cell"""
+        if self.original_board[row, col] != 0 or not 1 <= num <= self.size:
+            return
+        pos = row * self.size + col
+        self.pencil_marks[pos] ^= 1 << num
+        self.journal.record(pos, 0, num, PENCIL)
+        self.emit(EVENT_PENCIL, row, col, num)
+
+    def get_pencil_marks(self, row: int, col: int) -> List[int]:
+        """Get the digits pencilled into a cell"""
+        mask = self.pencil_marks[row * self.size + col]
+        return [num for num in range(1, self.size + 1) if mask >> num & 1]
+
+    def undo(self) -> bool:
+        """Revert the last move, hint or pencil mark
+
+        Mistakes already counted stay counted.  Returns False if there was
+        nothing to undo.
+        """
+        if self.game_over or self.game_won:
+            return False
+        edit = self.journal.undo()
+        if edit is None:
+            return False
+        if edit.flags & PENCIL:
+            self.pencil_marks[edit.pos] ^= 1 << edit.new
+        else:
+            row, col = divmod(edit.pos, self.size)
+            self.set_cell(row, col, edit.old)
+        self.emit(EVENT_UNDO)
+        return True
+
+    def redo(self) -> bool:
+        """Reapply the last undone edit, returning False if there was none"""
+        if self.game_over or self.game_won:
+            return False
+        edit = self.journal.redo()
+        if edit is None:
+            return False
+        if edit.flags & PENCIL:
+            self.pencil_marks[edit.pos] ^= 1 << edit.new
+        else:
+            row, col = divmod(edit.pos, self.size)
+            self.set_cell(row, col, edit.new)
+            if self.check_win():
+                self.game_won = True
+        self.emit(EVENT_REDO)
+        return True
+
+    def reset_board(self):
+        """Reset board to original puzzle"""
+        for pos, num in enumerate(self.original_board):
+            self.set_cell(pos // self.size, pos % self.size, num)
+        self.clear_history()
+        self.mistakes = 0
+        self.game_over = False
+        self.game_won = False
+        self.emit(EVENT_RESET)
+
+    def show_solution(self):
+        """Show the complete solution"""
+        self.board = self.solution.copy()
+        self.constraints.load(self.board)
+        self.emit(EVENT_SOLUTION)
+
+    def update_elapsed_time(self) -> int:
+        """Refresh and return the elapsed play time in seconds"""
+        self.elapsed_time = int(time.time() - self.start_time)
+        return self.elapsed_time
@@ -0,0 +1,94 @@
+"""Font loading with an on-disk cache of resolved font files.
+
+pygame.font.SysFont finds a family by scanning every installed font the
+first time it is used in a process, which on Linux means running fc-list
+and can take longer than everything else at startup.  FontResolver keeps
+the file each family resolved to in a small JSON file, so later launches
+open the file directly with pygame.font.Font and never scan.  An entry
+whose file has gone is resolved again; families with no match are cached
+as the default font, so delete the cache to pick up newly installed ones.
+
+LazyFont defers even opening the file until a font first renders.
+"""
+import json
+import os
+from typing import Dict, Optional
+
+import pygame
+
+CACHE_VERSION = 1
+
+
+def default_cache_path() -> str:
+    """Get the font cache location under the user's cache directory"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'mini-sudoku', 'fonts.json')
+
+
+class FontResolver:
+    """Maps font family names to files, remembered across launches"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path if path is not None else default_cache_path()
+        # None for a family means pygame's default font
+        self._files: Optional[Dict[str, Optional[str]]] = None
+
+    def _load(self) -> Dict[str, Optional[str]]:
+        files = {}
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get('version') == CACHE_VERSION:
+                files = data.get('fonts', {})
+        except (OSError, ValueError):
+            pass
+        self._files = files
+        return files
+
+    def _save(self):
+        # Written to a temporary file first so a crash cannot leave half a cache
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, 'w') as f:
+                json.dump({'version': CACHE_VERSION, 'fonts': self._files}, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            # The cache only saves time, so a read-only home is not an error
+            pass
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Get the file for a font family, or None for the default font"""
+        files = self._files if self._files is not None else self._load()
+        if name in files:
+            path = files[name]
+            if path is None or os.path.exists(path):
+                return path
+        path = files[name] = pygame.font.match_font(name)
+        self._save()
+        return path
+
+
+class LazyFont:
+    """A pygame Font that is only opened when first used
+
+    Attribute access is forwarded to the real font, so it can stand in for
+    one anywhere, including as a RenderCache key.
+    """
+
+    __slots__ = ('resolver', 'name', 'size', '_font')
+
+    def __init__(self, resolver: FontResolver, name: str, size: int):
+        self.resolver = resolver
+        self.name = name
+        self.size = size
+        self._font: Optional[pygame.font.Font] = None
+
+    def load(self) -> pygame.font.Font:
+        """Open the font if it is not open yet"""
+        if self._font is None:
+            self._font = pygame.font.Font(self.resolver.resolve(self.name), self.size)
+        return self._font
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
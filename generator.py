@@ -0,0 +1,274 @@
+import datetime
+import hashlib
+import random
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from board import Board
+from grids import ENUMERABLE_SIZES, random_grid
+from logic import DIFFICULTY_NAMES, EASY, HARD, MEDIUM, LogicSolver
+from solver import BitsetSolver, DancingLinksSolver, Solver
+
+# Share of cells each difficulty level keeps as givens
+CLUE_FRACTIONS = (8 / 16, 7 / 16, 6 / 16)
+# Complete boards dug per puzzle in search of one that needs the
+# requested difficulty's techniques
+MAX_ATTEMPTS = 8
+# Grid sizes whose unique puzzles all fall to singles, so searching for a
+# harder one would only waste the attempts
+SINGLES_ONLY_SIZES = (4,)
+
+
+class PuzzleGenerator:
+    """Dig-holes generator for puzzles with exactly one solution.
+
+    A random complete board is sampled from the enumerated grid table for
+    small sizes or produced by ``solver`` otherwise, then cells are
+    cleared in random order.  After each removal ``counter`` counts
+    solutions up to two; if the puzzle stopped being unique, or ``grader``
+    finds it now needs techniques above the requested difficulty, the
+    digit is put back.  Digging stops at the difficulty's clue target,
+    or past it once the puzzle grades at the difficulty, or when no
+    further cell can be removed.
+
+    Each count gets a budget of ``max_steps`` placements and a removal
+    whose count runs over it is undone like an ambiguous one, so a rare
+    hard-to-decide board costs a few clues instead of minutes.  The
+    default counter is BitsetSolver, or DancingLinksSolver from 16x16 up,
+    where its column choice finds the forced digits bitset MRV misses.
+    """
+
+    def __init__(self, size: int, solver: Optional[Solver] = None,
+                 counter: Optional[Solver] = None,
+                 grader: Optional[LogicSolver] = None):
+        self.size = size
+        self.solver = solver if solver is not None else DancingLinksSolver(size)
+        if counter is None:
+            counter = BitsetSolver(size) if size < 16 else DancingLinksSolver(size)
+        self.counter = counter
+        self.max_steps = 2 * size * size
+        self.grader = grader if grader is not None else LogicSolver(size)
+
+    def complete_board(self, rng: random.Random) -> Board:
+        """Get a random complete board"""
+        if self.size in ENUMERABLE_SIZES:
+            return Board(self.size, random_grid(self.size, rng))
+        return Board(self.size, self.solver.generate(rng))
+
+    def target_clues(self, difficulty: int) -> int:
+        """Get the number of givens to aim for at a difficulty level"""
+        if not 0 <= difficulty < len(CLUE_FRACTIONS):
+            raise ValueError(f"unknown difficulty {difficulty}")
+        return round(self.size * self.size * CLUE_FRACTIONS[difficulty])
+
+    def dig(self, solution: Board, target: int, rng: random.Random,
+            max_level: Optional[int] = None, min_level: int = EASY) -> Board:
+        """Clear cells from a full board while the puzzle stays unique
+
+        With max_level, removals that would make the puzzle need harder
+        techniques than that level are undone as well.  A puzzle that
+        still grades below min_level at the clue target is dug further
+        until it reaches it; if it never does, the puzzle as it stood at
+        the target is returned.
+        """
+        puzzle = solution.copy()
+        cells = puzzle.cells
+        clues = len(cells)
+        order = list(range(len(cells)))
+        rng.shuffle(order)
+        count_solutions = self.counter.count_solutions
+        grade = self.grader.grade
+        max_steps = self.max_steps
+        level = EASY
+        at_target = None
+        for pos in order:
+            if clues <= target:
+                if level >= min_level:
+                    return puzzle
+                if at_target is None:
+                    at_target = puzzle.copy()
+            num = cells[pos]
+            cells[pos] = 0
+            if count_solutions(cells, 2, max_steps) != 1:
+                cells[pos] = num
+                continue
+            # Grades only matter under a cap or from the target on
+            if max_level is not None or clues <= target + 1:
+                new_level = grade(cells).level
+                if max_level is not None and new_level > max_level:
+                    cells[pos] = num
+                    continue
+                level = new_level
+            clues -= 1
+        if level < min_level and at_target is not None:
+            return at_target
+        return puzzle
+
+    def generate(self, difficulty: int = MEDIUM,
+                 rng: Optional[random.Random] = None) -> Tuple[Board, Board]:
+        """Generate a unique puzzle, returned as (puzzle, solution) boards
+
+        The puzzle never needs techniques above the difficulty.  One that
+        grades below it is dug again from a fresh board, up to
+        MAX_ATTEMPTS boards in all, and if none gets there the first is
+        returned, so it can still come out easier than asked.  Sizes in
+        SINGLES_ONLY_SIZES are always easy and take the first board.
+        """
+        if rng is None:
+            rng = random.Random()
+        target = self.target_clues(difficulty)
+        max_level = difficulty if difficulty < HARD else None
+        min_level = EASY if self.size in SINGLES_ONLY_SIZES else difficulty
+        first = None
+        for _ in range(MAX_ATTEMPTS):
+            solution = self.complete_board(rng)
+            puzzle = self.dig(solution, target, rng, max_level, min_level)
+            if min_level == EASY or self.grader.grade(puzzle.cells).level >= min_level:
+                return puzzle, solution
+            if first is None:
+                first = puzzle, solution
+        return first
+
+
+# Puzzle and solution cells, and the seed generate_puzzle made them from
+SeededPuzzle = Tuple[bytes, bytes, int]
+
+_generators = {}
+
+
+def generate_puzzle(size: int, difficulty: int,
+                    seed: Optional[int] = None) -> Tuple[Board, Board]:
+    """Generate one unique puzzle, reusing a cached generator per size
+
+    A plain module-level function so it can be submitted to a process pool.
+    """
+    generator = _generators.get(size)
+    if generator is None:
+        generator = _generators[size] = PuzzleGenerator(size)
+    return generator.generate(difficulty, random.Random(seed))
+
+
+def generate_chunk(size: int, difficulty: int, seed: int, count: int) -> List[SeededPuzzle]:
+    """Generate count puzzles, each from its own seed drawn from seed
+
+    Like generate_puzzle this is meant for pool workers; one task per
+    chunk keeps the cost of shipping work to a process small.
+    """
+    rng = random.Random(seed)
+    puzzles = []
+    for _ in range(count):
+        puzzle_seed = new_seed(rng)
+        puzzle, solution = generate_puzzle(size, difficulty, puzzle_seed)
+        puzzles.append((bytes(puzzle.cells), bytes(solution.cells), puzzle_seed))
+    return puzzles
+
+
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def format_cells(cells: Sequence[int]) -> str:
+    """Write a flat board as one character per cell, 0 for empty
+
+    Digits above 9 continue with letters, so 16x16 and 25x25 boards stay
+    one character per cell.
+    """
+    return ''.join(DIGITS[num] for num in cells)
+
+
+def parse_cells(text: str) -> List[int]:
+    """Read a flat board written by format_cells"""
+    try:
+        return [DIGITS.index(char) for char in text.strip().upper()]
+    except ValueError:
+        raise ValueError(f"invalid board string {text!r}")
+
+
+# Seeds are 64-bit, so a single getrandbits call draws one
+SEED_BITS = 64
+# Grid sizes an ID may name; a 16x16 puzzle takes a few seconds to
+# regenerate and larger grids far too long to do it on demand
+PUZZLE_ID_SIZES = (4, 9, 16)
+
+
+class PuzzleId(NamedTuple):
+    """The parts of a puzzle ID"""
+    size: int
+    difficulty: int
+    seed: int
+
+
+def new_seed(rng: random.Random) -> int:
+    """Draw the seed for one puzzle from a stream"""
+    return rng.getrandbits(SEED_BITS)
+
+
+def format_puzzle_id(size: int, difficulty: int, seed: int) -> str:
+    """Write an ID such as ``9M-3OUCLQRVPJKMW`` that names one puzzle
+
+    The grid size and the initial of the difficulty come first, then the
+    seed in base 36.  generate_puzzle on the same size, difficulty and seed
+    always produces the same puzzle, so the ID is all that needs storing.
+    """
+    if size not in PUZZLE_ID_SIZES:
+        raise ValueError(f"puzzle IDs are only supported for sizes {PUZZLE_ID_SIZES}, got {size}")
+    if not 0 <= seed < 1 << SEED_BITS:
+        raise ValueError(f"seed must fit in {SEED_BITS} bits, got {seed}")
+    digits = []
+    while True:
+        seed, digit = divmod(seed, len(DIGITS))
+        digits.append(DIGITS[digit])
+        if not seed:
+            break
+    return f"{size}{DIFFICULTY_NAMES[difficulty][0].upper()}-{''.join(reversed(digits))}"
+
+
+def parse_difficulty(value: str) -> int:
+    """Parse a difficulty given as a name or a level number"""
+    if value in DIFFICULTY_NAMES:
+        return DIFFICULTY_NAMES.index(value)
+    try:
+        difficulty = int(value)
+    except ValueError:
+        raise ValueError(
+            f"difficulty must be one of {', '.join(DIFFICULTY_NAMES)} or a level number")
+    if not 0 <= difficulty < len(DIFFICULTY_NAMES):
+        raise ValueError(f"unknown difficulty {difficulty}")
+    return difficulty
+
+
+def parse_puzzle_id(text: str) -> PuzzleId:
+    """Read a puzzle ID written by format_puzzle_id
+
+    Case, surrounding space and leading zeros are ignored, so pass the
+    result back through format_puzzle_id to get the ID in its usual form.
+    """
+    head, _, seed = text.strip().upper().partition('-')
+    initials = [name[0].upper() for name in DIFFICULTY_NAMES]
+    # ASCII only, as upper() maps some other letters onto ASCII ones
+    if (not text.isascii() or not head[:-1].isdecimal() or head[-1:] not in initials
+            or not seed or any(char not in DIGITS for char in seed)):
+        raise ValueError(f"invalid puzzle ID {text!r}")
+    value = int(seed, len(DIGITS))
+    if value >= 1 << SEED_BITS:
+        raise ValueError(f"invalid puzzle ID {text!r}")
+    size = int(head[:-1])
+    if size not in PUZZLE_ID_SIZES:
+        raise ValueError(f"puzzle ID {text!r} has unsupported grid size {size}")
+    return PuzzleId(size, initials.index(head[-1]), value)
+
+
+def puzzle_from_id(puzzle_id: str) -> Tuple[Board, Board]:
+    """Regenerate the (puzzle, solution) an ID names
+
+    IDs name puzzles of the default PuzzleGenerator; one with a different
+    solver builds other 9x9 and larger boards from the same seed.  Sizes
+    outside PUZZLE_ID_SIZES are rejected.
+    """
+    size, difficulty, seed = parse_puzzle_id(puzzle_id)
+    return generate_puzzle(size, difficulty, seed)
+
+
+def daily_puzzle_id(day: datetime.date, size: int, difficulty: int) -> str:
+    """Get the ID of the puzzle of the day, the same everywhere"""
+    key = f"daily:{day.isoformat()}:{size}:{difficulty}".encode()
+    seed = int.from_bytes(hashlib.blake2b(key, digest_size=SEED_BITS // 8).digest(), 'big')
+    return format_puzzle_id(size, difficulty, seed)
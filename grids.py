@@ -0,0 +1,206 @@
+"""Complete-grid tables and canonical forms for small Sudoku sizes.
+
+A 4x4 Sudoku has only 288 complete grids, so they are enumerated once and
+sampled directly instead of being searched for.  Grids and puzzles are also
+reduced to a canonical form under the Sudoku symmetry group: digit
+relabeling, band and stack permutations, row and column permutations within
+them, and transposition.  Two puzzles are equivalent exactly when their
+canonical keys match, which lets puzzle banks drop duplicates and lets a
+player be served puzzles they have never seen in any disguise.
+
+The geometric part of the group has (b!)^(2b + 2) * 2 elements for boxes
+of side b: 128 at 4x4 but over three million at 9x9, so canonical forms
+are only offered up to ``MAX_CANONICAL_SIZE``.
+"""
+import itertools
+import random
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from board import box_size_of
+from constraints import ConstraintTracker
+
+ENUMERABLE_SIZES = (4,)
+MAX_CANONICAL_SIZE = 4
+
+_grids: Dict[int, List[Tuple[int, ...]]] = {}
+_grid_keys: Dict[int, Dict[Tuple[int, ...], int]] = {}
+_transforms: Dict[int, List[Tuple[int, ...]]] = {}
+
+
+def all_grids(size: int) -> List[Tuple[int, ...]]:
+    """Get every complete grid of a small size as flat tuples
+
+    The table is built on first use and kept for the life of the process.
+    """
+    grids = _grids.get(size)
+    if grids is not None:
+        return grids
+    if size not in ENUMERABLE_SIZES:
+        raise ValueError(f"complete grids can only be enumerated for sizes {ENUMERABLE_SIZES}")
+
+    tracker = ConstraintTracker(size, box_size_of(size))
+    cells = [0] * (size * size)
+    grids = []
+
+    def fill(pos: int):
+        if pos == len(cells):
+            grids.append(tuple(cells))
+            return
+        row, col = divmod(pos, size)
+        mask = tracker.candidates(row, col)
+        for num in range(1, size + 1):
+            if mask >> num & 1:
+                cells[pos] = num
+                tracker.place(row, col, num)
+                fill(pos + 1)
+                tracker.remove(row, col, num)
+        cells[pos] = 0
+
+    fill(0)
+    _grids[size] = grids
+    return grids
+
+
+def random_grid(size: int, rng: random.Random) -> List[int]:
+    """Sample a complete grid uniformly from the enumerated table"""
+    return list(rng.choice(all_grids(size)))
+
+
+def transforms(size: int) -> List[Tuple[int, ...]]:
+    """Get the cell permutations of the geometric symmetry group
+
+    Each entry maps a position in the transformed grid to the position it
+    is read from in the original one.
+    """
+    perms = _transforms.get(size)
+    if perms is not None:
+        return perms
+    if size > MAX_CANONICAL_SIZE:
+        raise ValueError(f"canonical forms are only supported up to size {MAX_CANONICAL_SIZE}")
+    box_size = box_size_of(size)
+
+    # Every way to order the bands and the lines within each band
+    line_orders = []
+    inner = list(itertools.permutations(range(box_size)))
+    for band_order in itertools.permutations(range(box_size)):
+        for within in itertools.product(inner, repeat=box_size):
+            line_orders.append([band_order[i // box_size] * box_size + within[i // box_size][i % box_size]
+                                for i in range(size)])
+
+    perms = []
+    for rows in line_orders:
+        for cols in line_orders:
+            perms.append(tuple(rows[i] * size + cols[j] for i in range(size) for j in range(size)))
+            perms.append(tuple(cols[j] * size + rows[i] for i in range(size) for j in range(size)))
+    _transforms[size] = perms
+    return perms
+
+
+def _relabel(cells: Sequence[int], perm: Tuple[int, ...], size: int) -> Tuple[int, ...]:
+    """Apply a cell permutation and number digits by first appearance"""
+    labels = [0] * (size + 1)
+    next_label = 1
+    out = []
+    for pos in perm:
+        num = cells[pos]
+        if num:
+            label = labels[num]
+            if not label:
+                label = labels[num] = next_label
+                next_label += 1
+            out.append(label)
+        else:
+            out.append(0)
+    return tuple(out)
+
+
+@lru_cache(maxsize=65536)
+def _canonical(cells: Tuple[int, ...], size: int) -> Tuple[int, ...]:
+    return min(_relabel(cells, perm, size) for perm in transforms(size))
+
+
+def canonical_form(cells: Sequence[int], size: int) -> Tuple[int, ...]:
+    """Get the smallest equivalent board under the symmetry group
+
+    Works for complete grids and puzzles alike; empty cells stay 0.
+    """
+    return _canonical(tuple(cells), size)
+
+
+def pack_key(cells: Sequence[int], size: int) -> int:
+    """Pack a board into one int, one base-(size + 1) digit per cell"""
+    key = 0
+    base = size + 1
+    for num in cells:
+        key = key * base + num
+    return key
+
+
+def canonical_key(cells: Sequence[int], size: int) -> int:
+    """Get an int that is equal for exactly the equivalent boards
+
+    Complete grids of enumerable sizes are answered from a precomputed
+    table; everything else goes through a memoized canonical_form.
+    """
+    cells = tuple(cells)
+    if size in ENUMERABLE_SIZES and 0 not in cells:
+        keys = _grid_keys.get(size)
+        if keys is None:
+            keys = _grid_keys[size] = {
+                grid: pack_key(canonical_form(grid, size), size) for grid in all_grids(size)}
+        key = keys.get(cells)
+        if key is not None:
+            return key
+    return pack_key(_canonical(cells, size), size)
+
+
+def unique_puzzles(puzzles: Iterable[Tuple[Sequence[int], Sequence[int]]],
+                   size: int) -> Iterator[Tuple[Sequence[int], Sequence[int]]]:
+    """Drop (puzzle, solution) pairs equivalent to one already yielded"""
+    seen: Set[int] = set()
+    for puzzle, solution in puzzles:
+        key = canonical_key(puzzle, size)
+        if key not in seen:
+            seen.add(key)
+            yield puzzle, solution
+
+
+class PuzzleHistory:
+    """Equivalence classes of the puzzles one player has already been given"""
+
+    def __init__(self, size: int, keys: Optional[Iterable[int]] = None):
+        self.size = size
+        self.keys: Set[int] = set(keys) if keys is not None else set()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def is_new(self, puzzle: Sequence[int]) -> bool:
+        """Check that no equivalent puzzle has been served"""
+        return canonical_key(puzzle, self.size) not in self.keys
+
+    def add(self, puzzle: Sequence[int]) -> bool:
+        """Record a served puzzle, returning False if it was not new"""
+        key = canonical_key(puzzle, self.size)
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        return True
+
+    def fresh(self, source: Callable, attempts: int = 20) -> Callable:
+        """Wrap a puzzle source so it only returns puzzles new to this player
+
+        The wrapper retries the source up to attempts times and returns
+        None if every candidate had been seen, so the engine falls back to
+        its own generator.
+        """
+        def fresh_source(size: int, difficulty: int, rng: random.Random):
+            for _ in range(attempts):
+                puzzle = source(size, difficulty, rng)
+                if puzzle is None:
+                    return None
+                if self.add(puzzle[0]):
+                    return puzzle
+            return None
+        return fresh_source
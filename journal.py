@@ -0,0 +1,81 @@
+"""Undo/redo journal of cell edits.
+
+Every edit is packed into one 64-bit entry of an ``array('Q')``::
+
+    pos << 24 | old << 16 | new << 8 | flags
+
+so a game's history costs eight bytes per move.  A cursor marks how much of
+the journal is applied: undo steps the cursor back and returns the entry to
+revert, redo steps it forward again, and recording a new edit after an undo
+drops the entries past the cursor.  Nothing on the board is ever copied.
+
+Pencil-mark toggles are recorded with the PENCIL flag and the toggled digit
+as ``new``; a toggle is its own inverse, so undoing one toggles it back.
+"""
+from array import array
+from typing import NamedTuple, Optional
+
+# Entry flags
+PENCIL = 1
+HINT = 2
+
+
+class Edit(NamedTuple):
+    """One journal entry"""
+    pos: int
+    old: int
+    new: int
+    flags: int
+
+
+def pack_edit(pos: int, old: int, new: int, flags: int = 0) -> int:
+    """Pack an edit into a journal entry"""
+    return pos << 24 | old << 16 | new << 8 | flags
+
+
+def unpack_edit(entry: int) -> Edit:
+    """Unpack a journal entry"""
+    return Edit(entry >> 24, entry >> 16 & 0xFF, entry >> 8 & 0xFF, entry & 0xFF)
+
+
+class MoveJournal:
+    """Append-only edit log with an undo/redo cursor"""
+
+    def __init__(self):
+        self.entries = array('Q')
+        self.cursor = 0
+
+    def __len__(self) -> int:
+        return self.cursor
+
+    def clear(self):
+        """Forget every edit"""
+        del self.entries[:]
+        self.cursor = 0
+
+    def record(self, pos: int, old: int, new: int, flags: int = 0):
+        """Log an edit, discarding anything that was undone"""
+        if self.cursor < len(self.entries):
+            del self.entries[self.cursor:]
+        self.entries.append(pack_edit(pos, old, new, flags))
+        self.cursor += 1
+
+    def can_undo(self) -> bool:
+        return self.cursor > 0
+
+    def can_redo(self) -> bool:
+        return self.cursor < len(self.entries)
+
+    def undo(self) -> Optional[Edit]:
+        """Step back one edit, returning it so the caller can revert it"""
+        if self.cursor == 0:
+            return None
+        self.cursor -= 1
+        return unpack_edit(self.entries[self.cursor])
+
+    def redo(self) -> Optional[Edit]:
+        """Step forward one edit, returning it so the caller can reapply it"""
+        if self.cursor == len(self.entries):
+            return None
+        self.cursor += 1
+        return unpack_edit(self.entries[self.cursor - 1])
@@ -0,0 +1,168 @@
+"""Drive a running game server with many simulated players.
+
+Opens one connection per player, starts a game on each and then plays a
+random mix of moves, hints, undos and state reads for a fixed time,
+starting a new puzzle whenever a game ends.  Idle sessions can be created
+first to see how the server copes with a large resident population::
+
+    python server.py &
+    python loadgen.py --players 200 --idle 20000 --duration 10
+
+Reports the request rate, per-operation latency percentiles and the
+server's session count and peak memory.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.harness import percentile
+from server import DEFAULT_HOST, DEFAULT_PORT
+
+# Relative weights of the operations a player sends
+OPERATION_WEIGHTS = (('move', 70), ('hint', 10), ('undo', 10), ('state', 10))
+IDLE_CONNECTIONS = 32
+
+
+class Client:
+    """One connection speaking the JSON-lines protocol"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host: str, port: int) -> 'Client':
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def request(self, **request) -> dict:
+        self.writer.write(json.dumps(request).encode() + b'\n')
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return json.loads(line)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def choose_move(state: dict, rng: random.Random) -> Tuple[int, int, int]:
+    """Pick a random digit for a random cell that is not a given"""
+    size = state['size']
+    givens = state['givens']
+    open_cells = [pos for pos, char in enumerate(givens) if char == '0']
+    pos = rng.choice(open_cells)
+    # Mostly fill empty cells, sometimes overwrite or clear one
+    board = state['board']
+    empty = [pos for pos in open_cells if board[pos] == '0']
+    if empty and rng.random() < 0.8:
+        pos = rng.choice(empty)
+    num = rng.randint(0, size) if board[pos] != '0' else rng.randint(1, size)
+    return pos // size, pos % size, num
+
+
+async def play(host: str, port: int, size: int, difficulty: str, deadline: float,
+               rng: random.Random, latencies: Dict[str, List[float]]):
+    """Play games on one connection until the deadline"""
+    client = await Client.connect(host, port)
+    operations = [name for name, _ in OPERATION_WEIGHTS]
+    weights = [weight for _, weight in OPERATION_WEIGHTS]
+    try:
+        start = time.perf_counter()
+        state = await client.request(op='new', size=size, difficulty=difficulty)
+        latencies['new'].append(time.perf_counter() - start)
+        session = state['session']
+        while time.perf_counter() < deadline:
+            if state['won'] or state['over']:
+                request = {'op': 'new', 'session': session, 'size': size,
+                           'difficulty': difficulty}
+            else:
+                op = rng.choices(operations, weights)[0]
+                request = {'op': op, 'session': session}
+                if op == 'move':
+                    request['row'], request['col'], request['num'] = choose_move(state, rng)
+            start = time.perf_counter()
+            reply = await client.request(**request)
+            latencies[request['op']].append(time.perf_counter() - start)
+            if not reply['ok']:
+                raise RuntimeError(f"{request['op']} failed: {reply['error']}")
+            if 'board' in reply:
+                state = reply
+    finally:
+        await client.close()
+
+
+async def create_idle(host: str, port: int, size: int, difficulty: str, count: int):
+    """Start count games that are never played"""
+    async def worker(share: int):
+        client = await Client.connect(host, port)
+        try:
+            for _ in range(share):
+                await client.request(op='new', size=size, difficulty=difficulty)
+        finally:
+            await client.close()
+
+    connections = min(IDLE_CONNECTIONS, count)
+    await asyncio.gather(*(worker(count // connections + (i < count % connections))
+                           for i in range(connections)))
+
+
+async def run(args: argparse.Namespace) -> int:
+    rng = random.Random(args.seed)
+    if args.idle:
+        start = time.perf_counter()
+        await create_idle(args.host, args.port, args.size, args.difficulty, args.idle)
+        print(f"Created {args.idle} idle sessions in {time.perf_counter() - start:.2f}s")
+
+    latencies: Dict[str, List[float]] = {'new': [], 'move': [], 'hint': [], 'undo': [],
+                                         'state': []}
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(play(args.host, args.port, args.size, args.difficulty, deadline,
+                                random.Random(rng.getrandbits(64)), latencies)
+                           for _ in range(args.players)))
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"{total} requests from {args.players} players in {elapsed:.2f}s "
+          f"({total / elapsed:.0f} requests/sec)")
+    for op, samples in latencies.items():
+        if not samples:
+            continue
+        samples.sort()
+        print(f"  {op:<6} {len(samples):>8}  p50 {percentile(samples, 0.50) * 1000:7.3f}ms"
+              f"  p95 {percentile(samples, 0.95) * 1000:7.3f}ms"
+              f"  p99 {percentile(samples, 0.99) * 1000:7.3f}ms")
+
+    client = await Client.connect(args.host, args.port)
+    stats = await client.request(op='stats')
+    await client.close()
+    line = f"Server: {stats['sessions']} sessions"
+    if 'max_rss_kb' in stats:
+        line += f", peak RSS {stats['max_rss_kb'] / 1024:.1f} MiB"
+    print(line)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test a running game server")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--players', type=int, default=100,
+                        help="concurrent connections playing games")
+    parser.add_argument('--idle', type=int, default=0,
+                        help="sessions to create up front and leave idle")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds of play")
+    parser.add_argument('--size', type=int, default=4)
+    parser.add_argument('--difficulty', default='easy')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""Human-style logical solver and difficulty grader.
+
+Candidates are kept as one bitmask per cell (bit ``num - 1`` for digit
+``num``).  The solver repeatedly applies the cheapest technique that makes
+progress, in this order:
+
+    naked single, hidden single, naked pair, hidden pair,
+    pointing (box/line), box/line reduction
+
+and records which techniques it needed.  Puzzles it cannot finish need
+guessing and are graded hardest.  The same step search backs in-game hints,
+so a hint is the next deduction a player could actually make.
+"""
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from board import box_size_of
+
+# Difficulty levels, defined by the hardest technique a puzzle needs
+EASY = 0
+MEDIUM = 1
+HARD = 2
+DIFFICULTY_NAMES = ('easy', 'medium', 'hard')
+
+NAKED_SINGLE = 0
+HIDDEN_SINGLE = 1
+NAKED_PAIR = 2
+HIDDEN_PAIR = 3
+POINTING = 4
+BOX_LINE = 5
+TECHNIQUE_NAMES = ('naked single', 'hidden single', 'naked pair', 'hidden pair',
+                   'pointing', 'box/line reduction')
+TECHNIQUE_COSTS = (1, 2, 10, 15, 20, 25)
+# Difficulty level implied by each technique
+TECHNIQUE_LEVELS = (EASY, EASY, MEDIUM, MEDIUM, HARD, HARD)
+# Score added when logic alone cannot finish the puzzle
+GUESS_COST = 100
+
+
+class Step(NamedTuple):
+    """One deduction: a placement, or candidate eliminations"""
+    technique: int
+    pos: int = -1
+    num: int = 0
+    eliminations: Tuple[Tuple[int, int], ...] = ()
+
+
+class Grade(NamedTuple):
+    """Outcome of solving a puzzle by logic alone"""
+    solved: bool
+    counts: Tuple[int, ...]
+    score: int
+    level: int
+
+    def techniques(self) -> List[str]:
+        """Get the names of the techniques that were needed"""
+        return [name for name, count in zip(TECHNIQUE_NAMES, self.counts) if count]
+
+
+class LogicSolver:
+    """Technique-based solver for one grid size"""
+
+    def __init__(self, size: int):
+        box_size = box_size_of(size)
+        self.size = size
+        self.box_size = box_size
+        self.full = (1 << size) - 1
+
+        rows = [[row * size + col for col in range(size)] for row in range(size)]
+        cols = [[row * size + col for row in range(size)] for col in range(size)]
+        boxes = []
+        for box in range(size):
+            top = (box // box_size) * box_size
+            left = (box % box_size) * box_size
+            boxes.append([(top + i) * size + left + j
+                          for i in range(box_size) for j in range(box_size)])
+        self.rows = rows
+        self.cols = cols
+        self.boxes = boxes
+        self.units = rows + cols + boxes
+
+        self.box_of = [0] * (size * size)
+        for box, cells in enumerate(boxes):
+            for pos in cells:
+                self.box_of[pos] = box
+        self.peers = []
+        for pos in range(size * size):
+            row, col = divmod(pos, size)
+            peers = set(rows[row]) | set(cols[col]) | set(boxes[self.box_of[pos]])
+            peers.discard(pos)
+            self.peers.append(tuple(sorted(peers)))
+
+    def candidates(self, cells: Sequence[int]) -> List[int]:
+        """Get the candidate mask of every cell; filled cells get 0"""
+        cands = [0 if num else self.full for num in cells]
+        for pos, num in enumerate(cells):
+            if num:
+                bit = 1 << (num - 1)
+                for peer in self.peers[pos]:
+                    cands[peer] &= ~bit
+        return cands
+
+    def place(self, cells: List[int], cands: List[int], pos: int, num: int):
+        """Fill a cell and remove the digit from its peers' candidates"""
+        cells[pos] = num
+        cands[pos] = 0
+        mask = ~(1 << (num - 1))
+        for peer in self.peers[pos]:
+            cands[peer] &= mask
+
+    def apply(self, cells: List[int], cands: List[int], step: Step):
+        """Apply a step found by next_step"""
+        if step.num:
+            self.place(cells, cands, step.pos, step.num)
+        for pos, mask in step.eliminations:
+            cands[pos] &= ~mask
+
+    def next_step(self, cells: Sequence[int], cands: Sequence[int]) -> Optional[Step]:
+        """Find the cheapest deduction available, or None if stuck"""
+        # Naked single: a cell with one candidate left
+        for pos, mask in enumerate(cands):
+            if mask and not mask & (mask - 1):
+                return Step(NAKED_SINGLE, pos, mask.bit_length())
+
+        # Hidden single: a digit with one place left in a unit
+        for unit in self.units:
+            once = twice = 0
+            for pos in unit:
+                mask = cands[pos]
+                twice |= once & mask
+                once |= mask
+            singles = once & ~twice
+            if singles:
+                bit = singles & -singles
+                for pos in unit:
+                    if cands[pos] & bit:
+                        return Step(HIDDEN_SINGLE, pos, bit.bit_length())
+
+        for technique in (self._naked_pair, self._hidden_pair,
+                          self._pointing, self._box_line):
+            step = technique(cands)
+            if step is not None:
+                return step
+        return None
+
+    def _naked_pair(self, cands: Sequence[int]) -> Optional[Step]:
+        """Two cells of a unit sharing the same two candidates"""
+        for unit in self.units:
+            seen = {}
+            for pos in unit:
+                mask = cands[pos]
+                rest = mask & (mask - 1)
+                if rest and not rest & (rest - 1):
+                    if mask in seen:
+                        other = seen[mask]
+                        eliminations = tuple((p, cands[p] & mask) for p in unit
+                                             if p != pos and p != other and cands[p] & mask)
+                        if eliminations:
+                            return Step(NAKED_PAIR, eliminations=eliminations)
+                    else:
+                        seen[mask] = pos
+        return None
+
+    def _hidden_pair(self, cands: Sequence[int]) -> Optional[Step]:
+        """Two digits confined to the same two cells of a unit"""
+        for unit in self.units:
+            places = {}
+            for digit in range(self.size):
+                bit = 1 << digit
+                where = tuple(pos for pos in unit if cands[pos] & bit)
+                if len(where) == 2:
+                    if where in places:
+                        mask = places[where] | bit
+                        eliminations = tuple((pos, cands[pos] & ~mask) for pos in where
+                                             if cands[pos] & ~mask)
+                        if eliminations:
+                            return Step(HIDDEN_PAIR, eliminations=eliminations)
+                    else:
+                        places[where] = bit
+        return None
+
+    def _pointing(self, cands: Sequence[int]) -> Optional[Step]:
+        """A digit confined to one line within a box leaves the rest of the line"""
+        size = self.size
+        for box, box_cells in enumerate(self.boxes):
+            for digit in range(size):
+                bit = 1 << digit
+                where = [pos for pos in box_cells if cands[pos] & bit]
+                if len(where) < 2:
+                    continue
+                for line_of, lines in ((lambda p: p // size, self.rows),
+                                       (lambda p: p % size, self.cols)):
+                    line = line_of(where[0])
+                    if all(line_of(pos) == line for pos in where[1:]):
+                        eliminations = tuple((pos, bit) for pos in lines[line]
+                                             if self.box_of[pos] != box and cands[pos] & bit)
+                        if eliminations:
+                            return Step(POINTING, eliminations=eliminations)
+        return None
+
+    def _box_line(self, cands: Sequence[int]) -> Optional[Step]:
+        """A digit confined to one box within a line leaves the rest of the box"""
+        box_of = self.box_of
+        for line in self.rows + self.cols:
+            for digit in range(self.size):
+                bit = 1 << digit
+                where = [pos for pos in line if cands[pos] & bit]
+                if len(where) < 2:
+                    continue
+                box = box_of[where[0]]
+                if all(box_of[pos] == box for pos in where[1:]):
+                    line_cells = set(line)
+                    eliminations = tuple((pos, bit) for pos in self.boxes[box]
+                                         if pos not in line_cells and cands[pos] & bit)
+                    if eliminations:
+                        return Step(BOX_LINE, eliminations=eliminations)
+        return None
+
+    def grade(self, cells: Sequence[int]) -> Grade:
+        """Solve a puzzle by logic and score how hard that was"""
+        work = list(cells)
+        cands = self.candidates(work)
+        counts = [0] * len(TECHNIQUE_NAMES)
+        peers = self.peers
+        empty = [pos for pos, num in enumerate(work) if num == 0]
+        while empty:
+            # Naked singles are the common case, so they skip next_step
+            remaining = []
+            for pos in empty:
+                mask = cands[pos]
+                if mask and not mask & (mask - 1):
+                    work[pos] = mask.bit_length()
+                    cands[pos] = 0
+                    for peer in peers[pos]:
+                        cands[peer] &= ~mask
+                    counts[NAKED_SINGLE] += 1
+                elif work[pos] == 0:
+                    remaining.append(pos)
+            if len(remaining) < len(empty):
+                empty = remaining
+                continue
+
+            step = self.next_step(work, cands)
+            if step is None:
+                break
+            counts[step.technique] += 1
+            self.apply(work, cands, step)
+            if step.num:
+                empty.remove(step.pos)
+
+        solved = not empty
+        score = sum(count * cost for count, cost in zip(counts, TECHNIQUE_COSTS))
+        level = EASY
+        for technique, count in enumerate(counts):
+            if count and TECHNIQUE_LEVELS[technique] > level:
+                level = TECHNIQUE_LEVELS[technique]
+        if not solved:
+            score += GUESS_COST
+            level = HARD
+        return Grade(solved, tuple(counts), score, level)
+
+    def hint(self, cells: Sequence[int]) -> Optional[Step]:
+        """Find the next cell a player can fill by logic
+
+        Elimination-only steps are applied silently until a placement turns
+        up; the returned step names the technique that made that placement.
+        Returns None when logic alone cannot place anything.
+        """
+        work = list(cells)
+        cands = self.candidates(work)
+        while True:
+            step = self.next_step(work, cands)
+            if step is None or step.num:
+                return step
+            self.apply(work, cands, step)
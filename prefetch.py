@@ -0,0 +1,130 @@
+import random
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import Executor
+from typing import Deque, Dict, Iterable, Optional, Sequence, Set, Tuple
+
+from generator import (DIFFICULTY_NAMES, PUZZLE_ID_SIZES, PuzzleGenerator, format_puzzle_id,
+                       generate_puzzle, new_seed)
+
+DEFAULT_DEPTH = 4
+DEFAULT_REFILL_AT = 1
+
+# Puzzle, solution and the puzzle's ID, or None for sizes IDs do not cover
+ReadyPuzzle = Tuple[Sequence[int], Sequence[int], Optional[str]]
+
+
+class PuzzlePrefetcher:
+    """Bounded queues of ready puzzles refilled by a background worker.
+
+    One queue is kept per difficulty level.  When a queue drops to
+    ``refill_at`` puzzles the worker tops it back up to ``depth``.  The
+    worker thread generates puzzles itself, or hands each one to
+    ``executor`` (e.g. a ProcessPoolExecutor) to keep generation off the
+    interpreter running the game.
+
+    An instance is a puzzle source for SudokuEngine: it returns None when
+    the requested queue is empty, and the engine then falls back to
+    generating synchronously.
+    """
+
+    def __init__(self, size: int, depth: int = DEFAULT_DEPTH,
+                 refill_at: int = DEFAULT_REFILL_AT,
+                 difficulties: Optional[Iterable[int]] = None,
+                 executor: Optional[Executor] = None,
+                 rng: Optional[random.Random] = None):
+        if depth < 1:
+            raise ValueError("prefetch depth must be at least 1")
+        if not 0 <= refill_at < depth:
+            raise ValueError("refill watermark must be between 0 and depth - 1")
+        if difficulties is None:
+            difficulties = range(len(DIFFICULTY_NAMES))
+        self.size = size
+        self.depth = depth
+        self.refill_at = refill_at
+        self.executor = executor
+        self.rng = rng if rng is not None else random.Random()
+        self._queues: Dict[int, Deque[ReadyPuzzle]] = {
+            difficulty: deque() for difficulty in difficulties}
+        self._refilling: Set[int] = set(self._queues)
+        self._generator = PuzzleGenerator(size) if executor is None else None
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="puzzle-prefetch", daemon=True)
+
+    def start(self) -> 'PuzzlePrefetcher':
+        """Start the background worker"""
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the background worker and wait for it to exit"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def ready(self, difficulty: int) -> int:
+        """Get the number of puzzles queued for a difficulty level"""
+        queue = self._queues.get(difficulty)
+        return len(queue) if queue is not None else 0
+
+    def __call__(self, size: int, difficulty: int,
+                 rng: random.Random) -> Optional[ReadyPuzzle]:
+        """Pop a ready puzzle with its ID, or None if none is queued"""
+        queue = self._queues.get(difficulty)
+        if size != self.size or queue is None:
+            return None
+        with self._condition:
+            puzzle = queue.popleft() if queue else None
+            if len(queue) <= self.refill_at and difficulty not in self._refilling:
+                self._refilling.add(difficulty)
+                self._condition.notify()
+        return puzzle
+
+    def _next_difficulty(self) -> Optional[int]:
+        """Pick the refilling queue with the fewest puzzles"""
+        best = None
+        for difficulty in self._refilling:
+            if best is None or len(self._queues[difficulty]) < len(self._queues[best]):
+                best = difficulty
+        return best
+
+    def _generate(self, difficulty: int) -> ReadyPuzzle:
+        # Per-puzzle seeds make the sequence the same with or without an executor
+        seed = new_seed(self.rng)
+        if self.executor is not None:
+            puzzle, solution = self.executor.submit(
+                generate_puzzle, self.size, difficulty, seed).result()
+        else:
+            puzzle, solution = self._generator.generate(difficulty, random.Random(seed))
+        puzzle_id = (format_puzzle_id(self.size, difficulty, seed)
+                     if self.size in PUZZLE_ID_SIZES else None)
+        return puzzle, solution, puzzle_id
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and not self._refilling:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                difficulty = self._next_difficulty()
+
+            try:
+                puzzle = self._generate(difficulty)
+            except Exception:
+                # Keep the worker alive; the queue is asked for again the
+                # next time a take finds it low
+                traceback.print_exc()
+                with self._condition:
+                    self._refilling.discard(difficulty)
+                continue
+
+            with self._condition:
+                queue = self._queues[difficulty]
+                queue.append(puzzle)
+                if len(queue) >= self.depth:
+                    self._refilling.discard(difficulty)
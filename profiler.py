@@ -0,0 +1,116 @@
+"""Frame timing for the game loop.
+
+The loop marks the end of each phase of a frame; the profiler keeps the
+start time, total and per-phase durations of the most recent frames in a
+fixed-size ``array('d')`` ring buffer.  Recording a frame is a handful of
+perf_counter calls and array stores with no allocation, so the profiler
+can stay on all the time and the overlay only reads from it when shown.
+"""
+import time
+from array import array
+from typing import List, NamedTuple, Tuple
+
+PHASE_EVENTS = 0
+PHASE_STATE = 1
+PHASE_DRAW = 2
+PHASE_PRESENT = 3
+PHASE_NAMES = ('events', 'state', 'draw', 'present')
+
+DEFAULT_CAPACITY = 600
+
+# Frame start, total duration, then one duration per phase
+_FIELDS = 2 + len(PHASE_NAMES)
+
+
+class FrameSummary(NamedTuple):
+    """Statistics over the buffered frames, with times in milliseconds"""
+    frames: int
+    fps: float
+    p50: float
+    p95: float
+    p99: float
+    phases: Tuple[float, ...]
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class FrameProfiler:
+    """Per-phase frame timings kept in a ring buffer"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.samples = array('d', [0.0]) * (capacity * _FIELDS)
+        self.count = 0
+        self._phases = array('d', [0.0]) * len(PHASE_NAMES)
+        self._start = 0.0
+        self._mark = 0.0
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def begin_frame(self):
+        """Start timing a frame"""
+        self._start = self._mark = time.perf_counter()
+        for phase in range(len(PHASE_NAMES)):
+            self._phases[phase] = 0.0
+
+    def mark(self, phase: int):
+        """Charge the time since the last mark to a phase"""
+        now = time.perf_counter()
+        self._phases[phase] += now - self._mark
+        self._mark = now
+
+    def end_frame(self):
+        """Store the frame in the ring buffer"""
+        base = (self.count % self.capacity) * _FIELDS
+        samples = self.samples
+        samples[base] = self._start
+        samples[base + 1] = self._mark - self._start
+        samples[base + 2:base + _FIELDS] = self._phases
+        self.count += 1
+
+    def frames(self) -> List[Tuple[float, ...]]:
+        """Get the buffered frames oldest first as (start, total, *phases) in seconds"""
+        size = len(self)
+        first = self.count - size
+        samples = self.samples
+        rows = []
+        for i in range(first, self.count):
+            base = (i % self.capacity) * _FIELDS
+            rows.append(tuple(samples[base:base + _FIELDS]))
+        return rows
+
+    def recent_totals(self, count: int) -> List[float]:
+        """Get the durations of the last count frames in milliseconds, oldest first"""
+        count = min(count, len(self))
+        samples = self.samples
+        return [samples[(i % self.capacity) * _FIELDS + 1] * 1000
+                for i in range(self.count - count, self.count)]
+
+    def summary(self) -> FrameSummary:
+        """Summarize the buffered frames"""
+        size = len(self)
+        if not size:
+            return FrameSummary(0, 0.0, 0.0, 0.0, 0.0, (0.0,) * len(PHASE_NAMES))
+        # Order does not matter here, so the filled part of the ring is read as is
+        filled = self.samples[:size * _FIELDS]
+        totals = sorted(filled[1::_FIELDS])
+        since = time.perf_counter() - 1.0
+        fps = float(sum(1 for start in filled[0::_FIELDS] if start >= since))
+        phases = tuple(sum(filled[2 + phase::_FIELDS]) * 1000 / size
+                       for phase in range(len(PHASE_NAMES)))
+        return FrameSummary(size, fps, _percentile(totals, 0.50) * 1000,
+                            _percentile(totals, 0.95) * 1000,
+                            _percentile(totals, 0.99) * 1000, phases)
+
+    def dump(self, path: str):
+        """Write the buffered frames as CSV, times in milliseconds"""
+        rows = self.frames()
+        origin = rows[0][0] if rows else 0.0
+        with open(path, 'w') as f:
+            f.write(','.join(('start', 'total') + PHASE_NAMES) + '\n')
+            for row in rows:
+                values = [(row[0] - origin) * 1000] + [value * 1000 for value in row[1:]]
+                f.write(','.join(f"{value:.4f}" for value in values) + '\n')
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Tuple
+
+import pygame
+
+Color = Tuple[int, int, int]
+
+
+class RenderCache:
+    """Surfaces reused across frames instead of being re-rendered.
+
+    Static layers (the background, button sprites) are built once per
+    layout; digits come from a per-font, per-color glyph atlas; any other
+    text is kept in a small LRU keyed on the string, which covers the
+    timer and status lines.  Everything is dropped when the layout key,
+    e.g. the window and grid size, changes.
+    """
+
+    def __init__(self, max_texts: int = 64):
+        self.max_texts = max_texts
+        self._layout_key: Hashable = None
+        self._layers: Dict[Hashable, pygame.Surface] = {}
+        self._atlases: Dict[Tuple[pygame.font.Font, Color], List[pygame.Surface]] = {}
+        self._texts: 'OrderedDict[Tuple[pygame.font.Font, Color, str], pygame.Surface]' = OrderedDict()
+
+    def invalidate(self):
+        """Drop every cached surface"""
+        self._layers.clear()
+        self._atlases.clear()
+        self._texts.clear()
+
+    def validate(self, layout_key: Hashable):
+        """Invalidate the cache if the layout changed since the last frame"""
+        if layout_key != self._layout_key:
+            self.invalidate()
+            self._layout_key = layout_key
+
+    def layer(self, key: Hashable, build: Callable[[], pygame.Surface]) -> pygame.Surface:
+        """Get a pre-composited surface, building it on first use"""
+        surface = self._layers.get(key)
+        if surface is None:
+            surface = self._layers[key] = build()
+        return surface
+
+    def glyph(self, font: pygame.font.Font, color: Color, num: int) -> pygame.Surface:
+        """Get the rendered surface for a digit"""
+        atlas = self._atlases.get((font, color))
+        if atlas is None:
+            atlas = self._atlases[(font, color)] = []
+        while len(atlas) <= num:
+            atlas.append(font.render(str(len(atlas)), True, color))
+        return atlas[num]
+
+    def text(self, font: pygame.font.Font, color: Color, text: str) -> pygame.Surface:
+        """Get a rendered line of text, keeping the most recent ones"""
+        key = (font, color, text)
+        surface = self._texts.get(key)
+        if surface is not None:
+            self._texts.move_to_end(key)
+            return surface
+        surface = self._texts[key] = font.render(text, True, color)
+        if len(self._texts) > self.max_texts:
+            self._texts.popitem(last=False)
+        return surface
@@ -0,0 +1,412 @@
+"""Serve games to many clients over a JSON-lines TCP protocol.
+
+Each request is one JSON object on its own line and gets one JSON line
+back, in order, so a plain ``nc localhost 8765`` is a usable client::
+
+    {"op": "new", "size": 4, "difficulty": "easy"}
+    {"op": "new", "puzzle": "4E-1JC1DR0LFHFSN"}
+    {"op": "move", "session": "...", "row": 0, "col": 1, "num": 3}
+    {"op": "hint", "session": "..."}
+    {"op": "undo", "session": "..."}
+    {"op": "state", "session": "..."}
+    {"op": "close", "session": "..."}
+    {"op": "stats"}
+
+Replies carry ``"ok": true`` and the session state, or ``"ok": false``
+and an error message.
+
+A session is only its cells, givens, solution, journal and a few counters
+in a slotted object, a couple of hundred bytes for a 4x4 game.  Requests
+are applied by loading a session into one shared SudokuEngine per grid
+size and storing it back, so the rules are exactly the game's own and no
+session carries a solver or constraint tracker of its own.  Moves, hints
+and undos never leave the event loop; new puzzles are generated in chunks
+by a process pool and handed out from a small stock per grid size and
+difficulty.  Sessions idle longer than ``--idle-timeout`` are dropped.
+
+    python server.py --port 8765
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import random
+import secrets
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+from engine import SudokuEngine
+from generator import (DIFFICULTY_NAMES, format_cells, format_puzzle_id, generate_chunk, new_seed,
+                       parse_difficulty, parse_puzzle_id, puzzle_from_id)
+from journal import MoveJournal
+from logic import TECHNIQUE_NAMES
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+SIZES = (4, 9, 16)
+DEFAULT_IDLE_TIMEOUT = 3600.0
+SWEEP_INTERVAL = 60.0
+# Puzzles generated per pool task for each grid size, and the stock kept
+# ready per key; a 16x16 puzzle takes seconds to dig, so those come singly
+CHUNK_SIZES = {4: 32, 9: 8, 16: 1}
+DEFAULT_STOCK = 64
+# Seconds a request waits on one pool task before it fails
+GENERATE_TIMEOUT = 30.0
+
+# Puzzle and solution cells, and the puzzle's ID
+Puzzle = Tuple[bytes, bytes, str]
+
+
+class RequestError(Exception):
+    """A request that cannot be served; the message goes back to the client"""
+
+
+def _int_field(request: dict, name: str, default: Optional[int] = None) -> int:
+    """Get an integer from a request, rejecting floats, bools and strings"""
+    value = request.get(name, default)
+    if type(value) is not int:
+        raise RequestError(f"{name} must be an integer")
+    return value
+
+
+def regenerate(puzzle_id: str) -> Puzzle:
+    """Rebuild the puzzle an ID names in a worker process"""
+    puzzle, solution = puzzle_from_id(puzzle_id)
+    return bytes(puzzle.cells), bytes(solution.cells), puzzle_id
+
+
+def _blank_puzzle(size: int, difficulty: int, rng: random.Random) -> Tuple[bytes, bytes]:
+    # Shared engines only ever play loaded sessions, so skip generating
+    return bytes(size * size), bytes(size * size)
+
+
+class PuzzleStock:
+    """Ready puzzles per grid size and difficulty, refilled from a pool
+
+    Taking a puzzle is a deque pop unless the stock has run dry; a refill
+    is started whenever a stock drops below half, and concurrent takers
+    share one refill rather than each submitting their own.  A refill is
+    one chunk and starts the next when it lands, so a taker never waits on
+    more than one pool task.
+    """
+
+    def __init__(self, executor: Executor, depth: int = DEFAULT_STOCK,
+                 chunk_sizes: Dict[int, int] = CHUNK_SIZES):
+        self.executor = executor
+        self.depth = depth
+        self.chunk_sizes = chunk_sizes
+        self.rng = random.Random()
+        self.ready: Dict[Tuple[int, int], Deque[Puzzle]] = {}
+        self.refills: Dict[Tuple[int, int], asyncio.Future] = {}
+
+    async def take(self, size: int, difficulty: int) -> Puzzle:
+        """Get a fresh puzzle, waiting for the pool only if none is ready"""
+        key = (size, difficulty)
+        ready = self.ready.setdefault(key, deque())
+        while not ready:
+            await self._refill(key)
+        puzzle = ready.popleft()
+        if len(ready) < self.depth // 2:
+            self._refill(key)
+        return puzzle
+
+    def _refill(self, key: Tuple[int, int]) -> asyncio.Future:
+        refill = self.refills.get(key)
+        if refill is None:
+            refill = self.refills[key] = asyncio.ensure_future(self._generate(key))
+            refill.add_done_callback(functools.partial(self._refilled, key))
+        return refill
+
+    def _refilled(self, key: Tuple[int, int], refill: asyncio.Future):
+        del self.refills[key]
+        if refill.cancelled():
+            return
+        error = refill.exception()
+        if error is not None:
+            # Background refills have nobody awaiting them to see the error
+            traceback.print_exception(type(error), error, error.__traceback__)
+        elif len(self.ready[key]) < self.depth:
+            self._refill(key)
+
+    async def _generate(self, key: Tuple[int, int]):
+        size, difficulty = key
+        loop = asyncio.get_running_loop()
+        # A timed-out task still runs to the end in its worker process
+        puzzles = await asyncio.wait_for(loop.run_in_executor(
+            self.executor, generate_chunk, size, difficulty,
+            new_seed(self.rng), self.chunk_sizes[size]), GENERATE_TIMEOUT)
+        self.ready[key].extend((puzzle, solution, format_puzzle_id(size, difficulty, seed))
+                               for puzzle, solution, seed in puzzles)
+
+    async def regenerate(self, puzzle_id: str) -> Puzzle:
+        """Rebuild a particular puzzle in the pool, bypassing the stock"""
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(
+            loop.run_in_executor(self.executor, regenerate, puzzle_id), GENERATE_TIMEOUT)
+
+
+class Session:
+    """The state of one game, kept small so idle sessions cost little"""
+
+    __slots__ = ('size', 'puzzle_id', 'cells', 'givens', 'solution', 'journal', 'mistakes',
+                 'won', 'over', 'started', 'touched')
+
+    def __init__(self, size: int, puzzle_id: str, puzzle: bytes, solution: bytes):
+        self.size = size
+        self.puzzle_id = puzzle_id
+        self.cells = bytearray(puzzle)
+        self.givens = puzzle
+        self.solution = solution
+        # Only created once there is something to undo
+        self.journal: Optional[MoveJournal] = None
+        self.mistakes = 0
+        self.won = False
+        self.over = False
+        self.started = time.time()
+        self.touched = time.monotonic()
+
+
+class GameServer:
+    """Sessions and the request handlers for the JSON-lines protocol"""
+
+    def __init__(self, executor: Executor, idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                 stock: int = DEFAULT_STOCK, chunk_sizes: Dict[int, int] = CHUNK_SIZES):
+        self.idle_timeout = idle_timeout
+        self.stock = PuzzleStock(executor, stock, chunk_sizes)
+        self.sessions: Dict[str, Session] = {}
+        self.engines: Dict[int, SudokuEngine] = {}
+        self.requests = 0
+
+    def engine_for(self, session: Session) -> SudokuEngine:
+        """Load a session into the shared engine for its grid size"""
+        engine = self.engines.get(session.size)
+        if engine is None:
+            engine = self.engines[session.size] = SudokuEngine(session.size,
+                                                               puzzle_source=_blank_puzzle)
+        # The boards are rebound to the session's bytes, not copied, so the
+        # engine's edits land straight in the session
+        engine.board.cells = session.cells
+        engine.original_board.cells = session.givens
+        engine.solution.cells = session.solution
+        engine.constraints.load(session.cells)
+        engine.journal = session.journal if session.journal is not None else MoveJournal()
+        engine.mistakes = session.mistakes
+        engine.game_won = session.won
+        engine.game_over = session.over
+        engine.last_hint = None
+        return engine
+
+    def store(self, session: Session, engine: SudokuEngine):
+        """Copy the engine's counters back into a session"""
+        session.journal = engine.journal if engine.journal.entries else None
+        session.mistakes = engine.mistakes
+        session.won = engine.game_won
+        session.over = engine.game_over
+
+    def lookup(self, request: dict) -> Session:
+        session_id = request.get('session')
+        session = self.sessions.get(session_id) if isinstance(session_id, str) else None
+        if session is None:
+            raise RequestError("unknown session")
+        session.touched = time.monotonic()
+        return session
+
+    def state(self, session_id: str, session: Session) -> dict:
+        """Describe a session for a reply"""
+        journal = session.journal
+        return {'ok': True, 'session': session_id, 'size': session.size,
+                'puzzle_id': session.puzzle_id,
+                'board': format_cells(session.cells), 'givens': format_cells(session.givens),
+                'mistakes': session.mistakes, 'won': session.won, 'over': session.over,
+                'can_undo': journal is not None and journal.can_undo(),
+                'elapsed': int(time.time() - session.started)}
+
+    async def new(self, request: dict) -> dict:
+        if 'puzzle' in request:
+            # Replay a particular puzzle by its ID
+            try:
+                size, difficulty, seed = parse_puzzle_id(str(request['puzzle']))
+            except ValueError as e:
+                raise RequestError(str(e))
+            if size not in SIZES:
+                raise RequestError(f"size must be one of {', '.join(map(str, SIZES))}")
+            try:
+                puzzle, solution, puzzle_id = await self.stock.regenerate(
+                    format_puzzle_id(size, difficulty, seed))
+            except asyncio.TimeoutError:
+                raise RequestError("timed out generating the puzzle")
+        else:
+            size = _int_field(request, 'size', 4)
+            if size not in SIZES:
+                raise RequestError(f"size must be one of {', '.join(map(str, SIZES))}")
+            try:
+                difficulty = parse_difficulty(str(request.get('difficulty', 'easy')))
+            except ValueError as e:
+                raise RequestError(str(e))
+            try:
+                puzzle, solution, puzzle_id = await self.stock.take(size, difficulty)
+            except asyncio.TimeoutError:
+                raise RequestError("timed out generating the puzzle")
+        # Passing an existing session starts a new puzzle in it
+        session_id = request.get('session')
+        if not isinstance(session_id, str) or session_id not in self.sessions:
+            session_id = secrets.token_hex(8)
+        self.sessions[session_id] = session = Session(size, puzzle_id, puzzle, solution)
+        reply = self.state(session_id, session)
+        reply['difficulty'] = DIFFICULTY_NAMES[difficulty]
+        return reply
+
+    def move(self, request: dict) -> dict:
+        session = self.lookup(request)
+        size = session.size
+        row = _int_field(request, 'row')
+        col = _int_field(request, 'col')
+        num = _int_field(request, 'num', 0)
+        if not (0 <= row < size and 0 <= col < size and 0 <= num <= size):
+            raise RequestError("move is off the board")
+        if session.won or session.over:
+            raise RequestError("game has ended")
+        if session.givens[row * size + col]:
+            raise RequestError("cell is a given")
+        engine = self.engine_for(session)
+        engine.make_move(row, col, num)
+        self.store(session, engine)
+        return self.state(request['session'], session)
+
+    def hint(self, request: dict) -> dict:
+        session = self.lookup(request)
+        engine = self.engine_for(session)
+        engine.provide_hint()
+        self.store(session, engine)
+        reply = self.state(request['session'], session)
+        if engine.last_hint is not None:
+            row, col, technique = engine.last_hint
+            reply['hint'] = {'row': row, 'col': col, 'num': session.solution[row * session.size + col],
+                             'technique': None if technique is None else TECHNIQUE_NAMES[technique]}
+        return reply
+
+    def undo(self, request: dict) -> dict:
+        session = self.lookup(request)
+        engine = self.engine_for(session)
+        undone = engine.undo()
+        self.store(session, engine)
+        reply = self.state(request['session'], session)
+        reply['undone'] = undone
+        return reply
+
+    def get_state(self, request: dict) -> dict:
+        return self.state(request['session'], self.lookup(request))
+
+    def close(self, request: dict) -> dict:
+        self.lookup(request)
+        del self.sessions[request['session']]
+        return {'ok': True}
+
+    def stats(self, request: dict) -> dict:
+        reply = {'ok': True, 'sessions': len(self.sessions), 'requests': self.requests}
+        if resource is not None:
+            # Kilobytes on Linux
+            reply['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return reply
+
+    async def dispatch(self, line: bytes) -> dict:
+        """Handle one request line"""
+        self.requests += 1
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {'ok': False, 'error': "request is not valid JSON"}
+        try:
+            if not isinstance(request, dict):
+                raise RequestError("request must be a JSON object")
+            op = request.get('op')
+            if op == 'new':
+                return await self.new(request)
+            handler = self.handlers.get(op) if isinstance(op, str) else None
+            if handler is None:
+                raise RequestError(f"unknown op {op!r}")
+            return handler(self, request)
+        except RequestError as e:
+            return {'ok': False, 'error': str(e)}
+        except Exception:
+            # A bug or a failed pool task must not drop the connection
+            traceback.print_exc()
+            return {'ok': False, 'error': "internal error"}
+
+    handlers = {'move': move, 'hint': hint, 'undo': undo, 'state': get_state,
+                'close': close, 'stats': stats}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one client connection until it disconnects"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                reply = await self.dispatch(line)
+                writer.write(json.dumps(reply, separators=(',', ':')).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def expire(self) -> int:
+        """Drop sessions idle past the timeout, returning how many went"""
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [session_id for session_id, session in self.sessions.items()
+                if session.touched < cutoff]
+        for session_id in idle:
+            del self.sessions[session_id]
+        return len(idle)
+
+    async def sweep(self):
+        while True:
+            await asyncio.sleep(min(SWEEP_INTERVAL, self.idle_timeout))
+            self.expire()
+
+
+async def serve(host: str, port: int, workers: Optional[int], idle_timeout: float):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        game_server = GameServer(executor, idle_timeout)
+        server = await asyncio.start_server(game_server.handle, host, port)
+        sweeper = asyncio.ensure_future(game_server.sweep())
+        print(f"Serving on {host}:{port}", file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            sweeper.cancel()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve games over JSON lines")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="puzzle generation processes (default: one per CPU)")
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help="seconds before an untouched session is dropped")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers or os.cpu_count(),
+                          args.idle_timeout))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
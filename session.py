@@ -0,0 +1,357 @@
+"""Crash-safe game sessions and headless replay.
+
+A session file is a header followed by one record per game event::
+
+    header   magic, version
+    record   payload length, payload, then the payload length again and
+             a CRC-32 of the payload
+
+A payload is the event kind, row, column, digit and a timestamp; puzzle
+records also carry the puzzle and its solution, one byte per cell, then
+the puzzle's ID in ASCII if it has one.  Records are only ever appended.
+Each one is flushed as soon as it is written and the file is fsynced at
+most every ``sync_interval`` seconds, on a later write or a maybe_sync
+call, so a crashed game loses nothing and a power cut loses at most the
+last interval.
+
+The length after each payload lets a reader walk the file backwards from
+its end, so resuming reads only the records of the last game.  A record
+torn by a crash fails its CRC and is cut off before anything new is
+appended.  Resuming a game writes a resume record, so the time the game
+was closed can be left out of its play time.
+
+Replaying feeds the events back through a SudokuEngine with no display and
+checks every recorded game outcome against the replayed one::
+
+    python session.py games.session [...]
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+import zlib
+from typing import BinaryIO, Dict, List, NamedTuple, Optional, Tuple
+
+from engine import (EVENT_HINT, EVENT_MOVE, EVENT_PENCIL, EVENT_PUZZLE, EVENT_REDO,
+                    EVENT_RESET, EVENT_SOLUTION, EVENT_UNDO, SudokuEngine)
+
+MAGIC = b'SDKSESS\0'
+VERSION = 1
+HEADER = struct.Struct('<8sH6x')
+PREFIX = struct.Struct('<I')
+TRAILER = struct.Struct('<II')
+EVENT = struct.Struct('<BBBBd')
+
+# Written when a game is won or lost: row holds the status bits, num the mistakes
+EVENT_END = 255
+# Written when a game is resumed; time before it since the last event was not played
+EVENT_RESUME = 254
+STATUS_WON = 1
+STATUS_OVER = 2
+
+DEFAULT_SYNC_INTERVAL = 1.0
+
+
+class Record(NamedTuple):
+    """One session event"""
+    kind: int
+    row: int
+    col: int
+    num: int
+    timestamp: float
+    cells: bytes = b''
+
+
+def pack_record(record: Record) -> bytes:
+    """Frame a record for appending to a session file"""
+    payload = EVENT.pack(record.kind, record.row, record.col, record.num,
+                         record.timestamp) + record.cells
+    return (PREFIX.pack(len(payload)) + payload
+            + TRAILER.pack(len(payload), zlib.crc32(payload)))
+
+
+def unpack_payload(payload: bytes) -> Record:
+    """Parse the payload of a framed record"""
+    kind, row, col, num, timestamp = EVENT.unpack_from(payload)
+    return Record(kind, row, col, num, timestamp, bytes(payload[EVENT.size:]))
+
+
+def _check_header(data: bytes):
+    if len(data) < HEADER.size:
+        raise ValueError("session file is truncated")
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a session file")
+    if version != VERSION:
+        raise ValueError(f"unsupported session file version {version}")
+
+
+def read_records(path: str) -> Tuple[List[Record], int]:
+    """Read every intact record from the start of a session file
+
+    Returns the records and the offset just past the last intact one.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    _check_header(data)
+    records = []
+    pos = HEADER.size
+    while pos + PREFIX.size <= len(data):
+        (length,) = PREFIX.unpack_from(data, pos)
+        end = pos + PREFIX.size + length + TRAILER.size
+        if length < EVENT.size or end > len(data):
+            break
+        payload = data[pos + PREFIX.size:end - TRAILER.size]
+        if TRAILER.unpack_from(data, end - TRAILER.size) != (length, zlib.crc32(payload)):
+            break
+        records.append(unpack_payload(payload))
+        pos = end
+    return records, pos
+
+
+def _last_game(records: List[Record]) -> List[Record]:
+    for i in range(len(records) - 1, -1, -1):
+        if records[i].kind == EVENT_PUZZLE:
+            return records[i:]
+    return []
+
+
+def _finished(records: List[Record]) -> bool:
+    """Check whether a game ended and was not reset afterwards"""
+    finished = False
+    for record in records:
+        if record.kind == EVENT_END:
+            finished = True
+        elif record.kind == EVENT_RESET:
+            finished = False
+    return finished
+
+
+def _play_time(records: List[Record]) -> float:
+    """Add up the time played in a game, leaving out the gaps before each resume"""
+    played = 0.0
+    start = last = records[0].timestamp
+    for record in records:
+        if record.kind == EVENT_RESUME:
+            played += last - start
+            start = record.timestamp
+        last = record.timestamp
+    return played + last - start
+
+
+def _read_before(f: BinaryIO, end: int) -> Optional[Tuple[Record, int]]:
+    """Read the record ending at an offset, with its start, or None if it is torn"""
+    if end - HEADER.size < PREFIX.size + EVENT.size + TRAILER.size:
+        return None
+    f.seek(end - TRAILER.size)
+    length, crc = TRAILER.unpack(f.read(TRAILER.size))
+    start = end - TRAILER.size - length - PREFIX.size
+    if length < EVENT.size or start < HEADER.size:
+        return None
+    f.seek(start)
+    data = f.read(PREFIX.size + length)
+    payload = data[PREFIX.size:]
+    if PREFIX.unpack_from(data)[0] != length or zlib.crc32(payload) != crc:
+        return None
+    return unpack_payload(payload), start
+
+
+def read_last_game(path: str) -> List[Record]:
+    """Read the records of the last game in a session file
+
+    Walks back from the end of the file and stops at the last puzzle
+    record.  Only a torn final record forces a scan from the start.
+    """
+    with open(path, 'rb') as f:
+        _check_header(f.read(HEADER.size))
+        end = f.seek(0, os.SEEK_END)
+        records = []
+        while end > HEADER.size:
+            found = _read_before(f, end)
+            if found is None:
+                return _last_game(read_records(path)[0])
+            record, end = found
+            records.append(record)
+            if record.kind == EVENT_PUZZLE:
+                records.reverse()
+                return records
+    return []
+
+
+def apply_record(engine: SudokuEngine, record: Record) -> bool:
+    """Replay one event, returning False if a recorded outcome differs"""
+    kind = record.kind
+    if kind == EVENT_MOVE:
+        engine.make_move(record.row, record.col, record.num)
+    elif kind == EVENT_HINT:
+        engine.reveal(record.row, record.col)
+    elif kind == EVENT_PENCIL:
+        engine.toggle_pencil(record.row, record.col, record.num)
+    elif kind == EVENT_UNDO:
+        engine.undo()
+    elif kind == EVENT_REDO:
+        engine.redo()
+    elif kind == EVENT_RESET:
+        engine.reset_board()
+    elif kind == EVENT_SOLUTION:
+        engine.show_solution()
+    elif kind == EVENT_PUZZLE:
+        cells = record.row * record.row
+        puzzle_id = record.cells[2 * cells:].decode('ascii') or None
+        engine.start_puzzle(record.cells[:cells], record.cells[cells:2 * cells], puzzle_id)
+    elif kind == EVENT_END:
+        status = (STATUS_WON if engine.game_won else 0) | (STATUS_OVER if engine.game_over else 0)
+        return status == record.row and min(engine.mistakes, 255) == record.num
+    return True
+
+
+class SessionRecorder:
+    """Appends a game's events to a session file as they happen"""
+
+    def __init__(self, path: str, sync_interval: float = DEFAULT_SYNC_INTERVAL):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.engine: Optional[SudokuEngine] = None
+        self._ended = False
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._file = open(path, 'r+b')
+            _check_header(self._file.read(HEADER.size))
+            end = self._file.seek(0, os.SEEK_END)
+            if end > HEADER.size and _read_before(self._file, end) is None:
+                # Cut off a record torn by a crash
+                self._file.truncate(read_records(path)[1])
+            self._file.seek(0, os.SEEK_END)
+        else:
+            self._file = open(path, 'w+b')
+            self._file.write(HEADER.pack(MAGIC, VERSION))
+            self._sync()
+        self._dirty = False
+        self._last_sync = time.monotonic()
+
+    def attach(self, engine: SudokuEngine, resume: bool = True) -> bool:
+        """Start recording an engine's events
+
+        With resume, an unfinished last game in the file is replayed into
+        the engine and continued; otherwise the engine's current puzzle
+        starts a new game.  Returns True if a game was resumed.
+        """
+        self.engine = engine
+        engine.event_hook = None
+        resumed = False
+        if resume:
+            records = read_last_game(self.path)
+            if records and not _finished(records) and records[0].row == engine.size:
+                for record in records:
+                    apply_record(engine, record)
+                # Time spent with the game closed does not count
+                engine.start_time = time.time() - _play_time(records)
+                resumed = True
+        engine.event_hook = self.record
+        if resumed:
+            self.record(EVENT_RESUME, 0, 0, 0)
+        else:
+            self.record(EVENT_PUZZLE, 0, 0, 0)
+        return resumed
+
+    def record(self, kind: int, row: int, col: int, num: int):
+        """Append an engine event; used as SudokuEngine.event_hook"""
+        engine = self.engine
+        now = time.time()
+        cells = b''
+        if kind == EVENT_PUZZLE:
+            row = engine.size
+            cells = bytes(engine.original_board.cells) + bytes(engine.solution.cells)
+            if engine.puzzle_id is not None:
+                cells += engine.puzzle_id.encode('ascii')
+            self._ended = False
+        elif kind == EVENT_RESET:
+            self._ended = False
+        self._write(Record(kind, row, col, num, now, cells))
+
+        if not self._ended and (engine.game_won or engine.game_over):
+            self._ended = True
+            status = (STATUS_WON if engine.game_won else 0) | (STATUS_OVER if engine.game_over else 0)
+            self._write(Record(EVENT_END, status, 0, min(engine.mistakes, 255), now))
+
+    def _write(self, record: Record):
+        self._file.write(pack_record(record))
+        self._file.flush()
+        self._dirty = True
+        self.maybe_sync()
+
+    def maybe_sync(self):
+        """Fsync unsynced records once sync_interval has passed
+
+        Writes only sync when they land after the interval, so call this
+        periodically to bound the loss when no more events come.
+        """
+        if self._dirty and time.monotonic() - self._last_sync >= self.sync_interval:
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._dirty = False
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        """Detach from the engine and make every record durable"""
+        if self.engine is not None and self.engine.event_hook == self.record:
+            self.engine.event_hook = None
+        self._sync()
+        self._file.close()
+
+    def __enter__(self) -> 'SessionRecorder':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ReplayStats:
+    """Totals from replaying session files"""
+
+    def __init__(self):
+        self.games = 0
+        self.events = 0
+        self.mismatches = 0
+
+
+def replay_records(records: List[Record], stats: ReplayStats,
+                   engines: Dict[int, SudokuEngine]):
+    """Replay a list of records, reusing one engine per grid size"""
+    engine = None
+    for record in records:
+        if record.kind == EVENT_PUZZLE:
+            engine = engines.get(record.row)
+            if engine is None:
+                engine = engines[record.row] = SudokuEngine(record.row)
+            stats.games += 1
+        elif engine is None:
+            continue
+        stats.events += 1
+        if not apply_record(engine, record):
+            stats.mismatches += 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded game sessions")
+    parser.add_argument('paths', nargs='+', metavar='PATH')
+    args = parser.parse_args(argv)
+
+    stats = ReplayStats()
+    engines: Dict[int, SudokuEngine] = {}
+    start = time.perf_counter()
+    for path in args.paths:
+        records, _ = read_records(path)
+        replay_records(records, stats, engines)
+    elapsed = time.perf_counter() - start
+    rate = stats.games / elapsed if elapsed > 0 else 0.0
+    print(f"Replayed {stats.games} games ({stats.events} events) in {elapsed:.2f}s "
+          f"({rate:.0f} games/sec), {stats.mismatches} mismatched outcomes")
+    return 1 if stats.mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
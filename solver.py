@@ -0,0 +1,487 @@
+import random
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+from board import box_size_of
+from constraints import ConstraintTracker
+
+
+class Solver:
+    """Interface shared by the solver backends.
+
+    Boards are passed as flat row-major sequences of ``size * size`` ints
+    with 0 marking an empty cell.  Passing an ``rng`` randomizes the search
+    order, which turns ``solve`` on an empty board into a full-board
+    generator.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.box_size = box_size_of(size)
+
+    def solve(self, cells: Sequence[int],
+              rng: Optional[random.Random] = None) -> Optional[List[int]]:
+        """Return one solution of the puzzle, or None if it has none"""
+        raise NotImplementedError
+
+    def count_solutions(self, cells: Sequence[int], limit: int = 2,
+                        max_steps: Optional[int] = None) -> int:
+        """Count solutions of the puzzle, stopping once limit is reached
+
+        With max_steps the search gives up after trying that many
+        placements and returns -1.
+        """
+        raise NotImplementedError
+
+    def generate(self, rng: random.Random) -> List[int]:
+        """Return a random complete board"""
+        return self.solve(self.seed_diagonal(rng), rng)
+
+    def seed_diagonal(self, rng: random.Random) -> List[int]:
+        """Fill the boxes on the main diagonal with shuffled digits
+
+        The diagonal boxes share no row or column, so any fill is
+        consistent and leaves the solver far less to search.
+        """
+        size, box_size = self.size, self.box_size
+        cells = [0] * (size * size)
+        for box in range(box_size):
+            digits = list(range(1, size + 1))
+            rng.shuffle(digits)
+            for i, num in enumerate(digits):
+                row = box * box_size + i // box_size
+                col = box * box_size + i % box_size
+                cells[row * size + col] = num
+        return cells
+
+    def has_conflicts(self, cells: Sequence[int]) -> bool:
+        """Check whether the givens already break a Sudoku rule"""
+        tracker = ConstraintTracker(self.size, self.box_size)
+        for pos, num in enumerate(cells):
+            if num != 0:
+                tracker.place(pos // self.size, pos % self.size, num)
+        return tracker.conflicts > 0
+
+
+class BacktrackingSolver(Solver):
+    """Depth-first search over cells in row-major order"""
+
+    def _search(self, cells: Sequence[int], limit: int,
+                rng: Optional[random.Random],
+                max_steps: Optional[int] = None) -> Tuple[int, Optional[List[int]]]:
+        size = self.size
+        work = list(cells)
+        tracker = ConstraintTracker(size, self.box_size)
+        for pos, num in enumerate(work):
+            if num != 0:
+                tracker.place(pos // size, pos % size, num)
+        if tracker.conflicts:
+            return 0, None
+        empty = [pos for pos, num in enumerate(work) if num == 0]
+        found = [0, None]
+        steps = [0]
+
+        def solve(i: int) -> bool:
+            if i == len(empty):
+                found[0] += 1
+                if found[1] is None:
+                    found[1] = list(work)
+                return found[0] >= limit
+            pos = empty[i]
+            row, col = divmod(pos, size)
+            mask = tracker.candidates(row, col)
+            numbers = [num for num in range(1, size + 1) if mask >> num & 1]
+            if rng is not None:
+                rng.shuffle(numbers)
+            for num in numbers:
+                steps[0] += 1
+                if max_steps is not None and steps[0] > max_steps:
+                    found[0] = -1
+                    return True
+                work[pos] = num
+                tracker.place(row, col, num)
+                done = solve(i + 1)
+                tracker.remove(row, col, num)
+                if done:
+                    return True
+            work[pos] = 0
+            return False
+
+        solve(0)
+        return found[0], found[1]
+
+    def solve(self, cells: Sequence[int],
+              rng: Optional[random.Random] = None) -> Optional[List[int]]:
+        """Return one solution of the puzzle, or None if it has none"""
+        return self._search(cells, 1, rng)[1]
+
+    def count_solutions(self, cells: Sequence[int], limit: int = 2,
+                        max_steps: Optional[int] = None) -> int:
+        """Count solutions of the puzzle, stopping once limit is reached"""
+        return self._search(cells, limit, None, max_steps)[0]
+
+
+class DancingLinksSolver(Solver):
+    """Algorithm X over the Sudoku exact-cover matrix using Dancing Links.
+
+    The matrix has one column per cell, row/digit, column/digit and
+    box/digit constraint and one row per (cell, digit) candidate.  It is
+    built once per solver and restored after every search, so a solver
+    instance can be reused for any number of puzzles of its size.
+    """
+
+    def __init__(self, size: int):
+        super().__init__(size)
+        n = size
+        nn = n * n
+        box_size = self.box_size
+        ncols = 4 * nn
+
+        # Node 0 is the root, nodes 1..ncols are the column headers
+        left = [i - 1 for i in range(ncols + 1)]
+        left[0] = ncols
+        right = [i + 1 for i in range(ncols + 1)]
+        right[ncols] = 0
+        up = list(range(ncols + 1))
+        down = list(range(ncols + 1))
+        column = list(range(ncols + 1))
+        row_of = [-1] * (ncols + 1)
+        sizes = [0] * (ncols + 1)
+        row_nodes = [0] * (nn * n)
+
+        for pos in range(nn):
+            row, col = divmod(pos, n)
+            box = (row // box_size) * box_size + col // box_size
+            for digit in range(n):
+                candidate = pos * n + digit
+                first = len(left)
+                row_nodes[candidate] = first
+                targets = (1 + pos,
+                           1 + nn + row * n + digit,
+                           1 + 2 * nn + col * n + digit,
+                           1 + 3 * nn + box * n + digit)
+                for k, col_header in enumerate(targets):
+                    node = first + k
+                    up.append(up[col_header])
+                    down.append(col_header)
+                    down[up[col_header]] = node
+                    up[col_header] = node
+                    column.append(col_header)
+                    row_of.append(candidate)
+                    sizes[col_header] += 1
+                    left.append(node - 1 if k else first + 3)
+                    right.append(node + 1 if k < 3 else first)
+
+        self._left = left
+        self._right = right
+        self._up = up
+        self._down = down
+        self._column = column
+        self._row_of = row_of
+        self._sizes = sizes
+        self._row_nodes = row_nodes
+
+    def _cover(self, col: int):
+        left, right, up, down = self._left, self._right, self._up, self._down
+        column, sizes = self._column, self._sizes
+        left[right[col]] = left[col]
+        right[left[col]] = right[col]
+        i = down[col]
+        while i != col:
+            j = right[i]
+            while j != i:
+                up[down[j]] = up[j]
+                down[up[j]] = down[j]
+                sizes[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def _uncover(self, col: int):
+        left, right, up, down = self._left, self._right, self._up, self._down
+        column, sizes = self._column, self._sizes
+        i = up[col]
+        while i != col:
+            j = left[i]
+            while j != i:
+                sizes[column[j]] += 1
+                up[down[j]] = j
+                down[up[j]] = j
+                j = left[j]
+            i = up[i]
+        left[right[col]] = col
+        right[left[col]] = col
+
+    def _select(self, node: int):
+        """Cover the remaining columns of a chosen row"""
+        right, column = self._right, self._column
+        j = right[node]
+        while j != node:
+            self._cover(column[j])
+            j = right[j]
+
+    def _unselect(self, node: int):
+        """Undo _select in reverse order"""
+        left, column = self._left, self._column
+        j = left[node]
+        while j != node:
+            self._uncover(column[j])
+            j = left[j]
+
+    def _choose_column(self, rng: Optional[random.Random]) -> int:
+        """Pick the uncovered column with the fewest rows (MRV)"""
+        right, sizes = self._right, self._sizes
+        best = -1
+        best_size = 1 << 30
+        ties = []
+        col = right[0]
+        while col != 0:
+            size = sizes[col]
+            if size < best_size:
+                best, best_size = col, size
+                if size == 0:
+                    return col
+                ties = [col]
+            elif size == best_size:
+                ties.append(col)
+            col = right[col]
+        if rng is not None and len(ties) > 1:
+            return rng.choice(ties)
+        return best
+
+    def _search(self, cells: Sequence[int], limit: int,
+                rng: Optional[random.Random],
+                max_steps: Optional[int] = None) -> Tuple[int, Optional[List[int]]]:
+        """Run Algorithm X, returning the solution count and the first one
+
+        A count of -1 means the search gave up after max_steps rows were
+        tried.
+        """
+        if self.has_conflicts(cells):
+            return 0, None
+
+        n = self.size
+        right, down = self._right, self._down
+        column, row_of = self._column, self._row_of
+
+        # Remove the givens from the matrix
+        givens = []
+        for pos, num in enumerate(cells):
+            if num != 0:
+                node = self._row_nodes[pos * n + num - 1]
+                self._cover(column[node])
+                self._select(node)
+                givens.append(node)
+
+        count = 0
+        solution = None
+        stack = []
+        steps = 0
+        while True:
+            if right[0] == 0:
+                count += 1
+                if solution is None:
+                    solution = list(cells)
+                    for frame in stack:
+                        candidate = row_of[frame[1][frame[2]]]
+                        solution[candidate // n] = candidate % n + 1
+                if count >= limit:
+                    break
+            else:
+                col = self._choose_column(rng)
+                nodes = []
+                i = down[col]
+                while i != col:
+                    nodes.append(i)
+                    i = down[i]
+                if nodes:
+                    steps += 1
+                    if max_steps is not None and steps > max_steps:
+                        count = -1
+                        break
+                    if rng is not None:
+                        rng.shuffle(nodes)
+                    self._cover(col)
+                    self._select(nodes[0])
+                    stack.append([col, nodes, 0])
+                    continue
+
+            # Backtrack to the next untried row
+            while stack:
+                frame = stack[-1]
+                self._unselect(frame[1][frame[2]])
+                frame[2] += 1
+                if frame[2] < len(frame[1]):
+                    steps += 1
+                    self._select(frame[1][frame[2]])
+                    break
+                self._uncover(frame[0])
+                stack.pop()
+            else:
+                break
+
+        # Restore the matrix for the next search
+        while stack:
+            col, nodes, index = stack.pop()
+            self._unselect(nodes[index])
+            self._uncover(col)
+        for node in reversed(givens):
+            self._unselect(node)
+            self._uncover(column[node])
+
+        return count, solution
+
+    def solve(self, cells: Sequence[int],
+              rng: Optional[random.Random] = None) -> Optional[List[int]]:
+        """Return one solution of the puzzle, or None if it has none"""
+        return self._search(cells, 1, rng)[1]
+
+    def count_solutions(self, cells: Sequence[int], limit: int = 2,
+                        max_steps: Optional[int] = None) -> int:
+        """Count solutions of the puzzle, stopping once limit is reached"""
+        return self._search(cells, limit, None, max_steps)[0]
+
+    def generate(self, rng: random.Random) -> List[int]:
+        """Return a random complete board
+
+        Randomized searches occasionally wander into a large dead subtree,
+        so each attempt gets a step budget and is restarted with fresh
+        choices when it runs out.
+        """
+        max_steps = 2 * self.size * self.size
+        while True:
+            count, solution = self._search(self.seed_diagonal(rng), 1, rng, max_steps)
+            if count > 0:
+                return solution
+            max_steps *= 2
+
+
+class BitsetSolver(Solver):
+    """Backtracking over candidate bitsets with MRV cell ordering.
+
+    Rows, columns and boxes each keep the digits they use as one int, so
+    a cell's candidates are a couple of ORs away, and the search always
+    branches on the empty cell with the fewest candidates.  This is the
+    fastest backend for counting solutions of mostly-filled boards, which
+    is what uniqueness checks during puzzle generation need.
+    """
+
+    def __init__(self, size: int):
+        super().__init__(size)
+        n = size
+        box_size = self.box_size
+        self._full = (1 << n) - 1
+        self._row_of = [pos // n for pos in range(n * n)]
+        self._col_of = [pos % n for pos in range(n * n)]
+        self._box_of = [(pos // n // box_size) * box_size + pos % n // box_size
+                        for pos in range(n * n)]
+        self._digit_of = {1 << digit: digit + 1 for digit in range(n)}
+
+    def _search(self, cells: Sequence[int], limit: int,
+                rng: Optional[random.Random],
+                max_steps: Optional[int] = None) -> Tuple[int, Optional[List[int]]]:
+        n = self.size
+        full = self._full
+        row_of, col_of, box_of = self._row_of, self._col_of, self._box_of
+        digit_of = self._digit_of
+        rows = [0] * n
+        cols = [0] * n
+        boxes = [0] * n
+        work = list(cells)
+        empty = []
+        for pos, num in enumerate(work):
+            if num == 0:
+                empty.append(pos)
+                continue
+            bit = 1 << (num - 1)
+            r, c, b = row_of[pos], col_of[pos], box_of[pos]
+            if (rows[r] | cols[c] | boxes[b]) & bit:
+                return 0, None
+            rows[r] |= bit
+            cols[c] |= bit
+            boxes[b] |= bit
+
+        found = [0, None]
+        steps = [0]
+
+        def search(remaining: int) -> bool:
+            if remaining == 0:
+                found[0] += 1
+                if found[1] is None:
+                    found[1] = list(work)
+                return found[0] >= limit
+
+            # Branch on the most constrained empty cell
+            best_index = 0
+            best_mask = 0
+            best_count = n + 1
+            for i in range(remaining):
+                pos = empty[i]
+                mask = full & ~(rows[row_of[pos]] | cols[col_of[pos]] | boxes[box_of[pos]])
+                count = mask.bit_count()
+                if count < best_count:
+                    best_index, best_mask, best_count = i, mask, count
+                    if count <= 1:
+                        break
+            if best_count == 0:
+                return False
+
+            last = remaining - 1
+            pos = empty[best_index]
+            empty[best_index] = empty[last]
+            empty[last] = pos
+            r, c, b = row_of[pos], col_of[pos], box_of[pos]
+
+            bits = []
+            mask = best_mask
+            while mask:
+                bit = mask & -mask
+                bits.append(bit)
+                mask ^= bit
+            if rng is not None:
+                rng.shuffle(bits)
+
+            for bit in bits:
+                steps[0] += 1
+                if max_steps is not None and steps[0] > max_steps:
+                    found[0] = -1
+                    return True
+                rows[r] |= bit
+                cols[c] |= bit
+                boxes[b] |= bit
+                work[pos] = digit_of[bit]
+                done = search(last)
+                rows[r] ^= bit
+                cols[c] ^= bit
+                boxes[b] ^= bit
+                if done:
+                    return True
+            work[pos] = 0
+            return False
+
+        search(len(empty))
+        return found[0], found[1]
+
+    def solve(self, cells: Sequence[int],
+              rng: Optional[random.Random] = None) -> Optional[List[int]]:
+        """Return one solution of the puzzle, or None if it has none"""
+        return self._search(cells, 1, rng)[1]
+
+    def count_solutions(self, cells: Sequence[int], limit: int = 2,
+                        max_steps: Optional[int] = None) -> int:
+        """Count solutions of the puzzle, stopping once limit is reached"""
+        return self._search(cells, limit, None, max_steps)[0]
+
+
+SOLVERS: Dict[str, Type[Solver]] = {
+    'backtracking': BacktrackingSolver,
+    'bitset': BitsetSolver,
+    'dlx': DancingLinksSolver,
+}
+
+
+def make_solver(name: str, size: int) -> Solver:
+    """Create a solver backend by name"""
+    try:
+        solver_class = SOLVERS[name]
+    except KeyError:
+        raise ValueError(f"unknown solver {name!r}, expected one of {sorted(SOLVERS)}")
+    return solver_class(size)
@@ -1,27 +1,67 @@
+import time
+
+# Everything below counts towards the reported import time
+IMPORT_START = time.perf_counter()
+
+import argparse
+import datetime
 import pygame
 import sys
-import random
-import time
-from typing import List, Tuple, Optional
+from typing import Dict, List, Optional, Tuple
 
-# Initialize Pygame
-pygame.init()
+from bank import PuzzleBank, parse_difficulty
+from engine import GRID_SIZE, PuzzleSource, SudokuEngine
+from fonts import FontResolver, LazyFont
+from generator import daily_puzzle_id, format_puzzle_id, parse_puzzle_id
+from prefetch import DEFAULT_DEPTH, DEFAULT_REFILL_AT, PuzzlePrefetcher
+from profiler import (PHASE_DRAW, PHASE_EVENTS, PHASE_NAMES, PHASE_PRESENT, PHASE_STATE,
+                      FrameProfiler)
+from render_cache import RenderCache
+from session import SessionRecorder
 
-# Constants for 4x4 Mini Sudoku
-GRID_SIZE = 4
+IMPORT_TIME = time.perf_counter() - IMPORT_START
+
+# Layout constants for 4x4 Mini Sudoku
 CELL_SIZE = 100
 GRID_WIDTH = GRID_SIZE * CELL_SIZE
 GRID_HEIGHT = GRID_SIZE * CELL_SIZE
 MARGIN = 20
 WINDOW_WIDTH = GRID_WIDTH + 2 * MARGIN + 200  # Extra space for controls
 WINDOW_HEIGHT = GRID_HEIGHT + 2 * MARGIN + 50
-FPS = 60
+GRID_TOP = MARGIN + 30  # Room for the timer above the grid
+CONTROL_X = MARGIN + GRID_WIDTH + 20
+PALETTE_Y = GRID_TOP + 280
+STATUS_Y = WINDOW_HEIGHT - 100
+
+# Screen regions redrawn independently of the grid cells
+TIMER_RECT = pygame.Rect(0, 0, WINDOW_WIDTH - MARGIN - 150, GRID_TOP)
+MISTAKES_RECT = pygame.Rect(WINDOW_WIDTH - MARGIN - 150, 0, MARGIN + 150, GRID_TOP)
+PALETTE_RECT = pygame.Rect(CONTROL_X, PALETTE_Y + 30, GRID_SIZE * 45, 40)
+STATUS_RECT = pygame.Rect(0, STATUS_Y, WINDOW_WIDTH, WINDOW_HEIGHT - STATUS_Y)
+PROFILER_RECT = pygame.Rect(0, 0, 320, 150)
+
+# Fired once a second to advance the on-screen clock
+TIMER_EVENT = pygame.USEREVENT + 1
 
 
 
 
 \
 
+# Help text shown in the control panel
+CONTROLS = [
+    "1-4: Place number",
+    "DEL: Clear cell",
+    "Arrows: Move",
+    "SPACE: Get hint",
+    "R: Reset puzzle",
+    "U/Y: Undo/Redo",
+    "P: Pencil marks",
+    "N: New puzzle",
+    "F3: Profiler",
+    "ESC: Quit"
+]
+
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -35,165 +75,73 @@ BG_COLOR = (245, 245, 250)
 GRID_COLOR = (150, 150, 200)
 SELECTED_COLOR = (100, 150, 255)
 CONFLICT_COLOR = (255, 200, 200)
+PENCIL_COLOR = (90, 90, 120)
+PROFILER_BG = (20, 20, 30, 200)
+PROFILER_TEXT = (230, 230, 230)
+PROFILER_BAR = (100, 220, 120)
+PROFILER_SLOW_BAR = (240, 90, 90)
 
 class MiniSudoku:
-    def __init__(self):
+    def __init__(self, puzzle_source: Optional[PuzzleSource] = None,
+                 show_profiler: bool = False, report_startup: bool = False,
+                 font_cache: Optional[str] = None):
+        init_start = time.perf_counter()
+        # Only the modules the game uses; pygame.init() would also start
+        # audio, joysticks and the rest
+        pygame.display.init()
+        pygame.font.init()
         self.window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-        pygame.display.set_caption("Mini Sudoku - 4x4")
-        self.clock = pygame.time.Clock()
-        self.font = pygame.font.SysFont('Arial', 40)
-        self.small_font = pygame.font.SysFont('Arial', 24)
-        self.timer_font = pygame.font.SysFont('Arial', 28)
-        
-        self.reset_game()
-        
+        fonts = FontResolver(font_cache)
+        self.font = LazyFont(fonts, 'Arial', 40)
+        self.small_font = LazyFont(fonts, 'Arial', 24)
+        self.timer_font = LazyFont(fonts, 'Arial', 28)
+        self.pencil_font = LazyFont(fonts, 'Arial', 22)
+        self.profiler_font = LazyFont(fonts, 'Arial', 16)
+        self.render_cache = RenderCache()
+        
+        self.engine = SudokuEngine(puzzle_source=puzzle_source)
+        self.selected_cell = None
+        self.pencil_mode = False
+        self.needs_full_redraw = False
+        self.profiler = FrameProfiler()
+        self.show_profiler = show_profiler
+        # Set while a session file is recording the game
+        self.recorder: Optional[SessionRecorder] = None
+        self.update_caption()
+        # Seconds spent importing, initializing and drawing the first frame
+        self.report_startup = report_startup
+        self.startup_times: Dict[str, float] = {'import': IMPORT_TIME,
+                                                'init': time.perf_counter() - init_start}
+        
+    def update_caption(self):
+        """Show the current puzzle's ID in the window title"""
+        caption = "Mini Sudoku - 4x4"
+        if self.engine.puzzle_id is not None:
+            caption += f" - {self.engine.puzzle_id}"
+        pygame.display.set_caption(caption)
+
     def reset_game(self):
         """Reset the game state"""
-        self.board = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-        self.solution = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-        self.original_board = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
+        self.engine.reset_game()
         self.selected_cell = None
-        self.mistakes = 0
-        self.max_mistakes = 3
-        self.game_over = False
-        self.game_won = False
-        self.start_time = time.time()
-        self.elapsed_time = 0
-        self.generate_new_puzzle()
-        
-    def generate_new_puzzle(self):
-        """Generate a new Sudoku puzzle"""
-        # First generate a complete solution
-        self.solution = self.generate_complete_board()
-        
-        # Copy to board and remove some numbers
-        self.board = [row[:] for row in self.solution]
-        self.original_board = [row[:] for row in self.solution]
-        
-        # Remove numbers to create puzzle (keep about 40% numbers)
-        cells = [(i, j) for i in range(GRID_SIZE) for j in range(GRID_SIZE)]
-        random.shuffle(cells)
-        
-        # Keep 6-8 numbers (37.5% to 50%)
-        numbers_to_keep = random.randint(6, 8)
-        for i in range(numbers_to_keep, len(cells)):
-            row, col = cells[i]
-            self.board[row][col] = 0
-            self.original_board[row][col] = 0
-            
-    def generate_complete_board(self) -> List[List[int]]:
-        """Generate a complete valid Sudoku board"""
-        board = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-        
-        def is_valid(board: List[List[int]], row: int, col: int, num: int) -> bool:
-            # Check row
-            if num in board[row]:
-                return False
-            
-            # Check column
-            for i in range(GRID_SIZE):
-                if board[i][col] == num:
-                    return False
-            
-            # Check 2x2 box
-            box_row = (row // 2) * 2
-            box_col = (col // 2) * 2
-            for i in range(2):
-                for j in range(2):
-                    if board[box_row + i][box_col + j] == num:
-                        return False
-            
-            return True
-        
-        def solve(board: List[List[int]]) -> bool:
-            for row in range(GRID_SIZE):
-                for col in range(GRID_SIZE):
-                    if board[row][col] == 0:
-                        numbers = list(range(1, GRID_SIZE + 1))
-                        random.shuffle(numbers)
-                        for num in numbers:
-                            if is_valid(board, row, col, num):
-                                board[row][col] = num
-                                if solve(board):
-                                    return True
-                                board[row][col] = 0
-                        return False
-            return True
-        
-        solve(board)
-        return board
-    
-    def is_valid_move(self, board: List[List[int]], row: int, col: int, num: int) -> bool:
-        """Check if a move is valid"""
-        # Check row
-        for c in range(GRID_SIZE):
-            if board[row][c] == num and c != col:
-                return False
-        
-        # Check column
-        for r in range(GRID_SIZE):
-            if board[r][col] == num and r != row:
-                return False
-        
-        # Check 2x2 box
-        box_row = (row // 2) * 2
-        box_col = (col // 2) * 2
-        for i in range(2):
-            for j in range(2):
-                r = box_row + i
-                c = box_col + j
-                if board[r][c] == num and (r != row or c != col):
-                    return False
-        
-        return True
-    
-    def check_win(self) -> bool:
-        """Check if the board is complete and correct"""
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                if self.board[row][col] == 0:
-                    return False
-                if not self.is_valid_move(self.board, row, col, self.board[row][col]):
-                    return False
-        return True
-    
-    def get_conflicts(self, row: int, col: int, num: int) -> List[Tuple[int, int]]:
-        """Get all conflicting cells for a number"""
-        conflicts = []
+        self.needs_full_redraw = True
+        self.update_caption()
+
+    def start_puzzle_id(self, puzzle_id: str):
+        """Start playing the puzzle an ID names"""
+        self.engine.start_puzzle_id(puzzle_id)
+        self.selected_cell = None
+        self.needs_full_redraw = True
+        self.update_caption()
         
-        if num == 0:
-            return conflicts
-        
-        # Check row
-        for c in range(GRID_SIZE):
-            if self.board[row][c] == num and c != col:
-                conflicts.append((row, c))
-        
-        # Check column
-        for r in range(GRID_SIZE):
-            if self.board[r][col] == num and r != row:
-                conflicts.append((r, col))
-        
-        # Check 2x2 box
-        box_row = (row // 2) * 2
-        box_col = (col // 2) * 2
-        for i in range(2):
-            for j in range(2):
-                r = box_row + i
-                c = box_col + j
-                if self.board[r][c] == num and (r != row or c != col):
-                    conflicts.append((r, c))
-        
-        return conflicts
-    
     def handle_click(self, pos: Tuple[int, int]):
         """Handle mouse click"""
-        if self.game_over or self.game_won:
+        if self.engine.game_over or self.engine.game_won:
             return
         
         x, y = pos
         grid_x = x - MARGIN
-        grid_y = y - MARGIN - 30  # Account for timer space
+        grid_y = y - GRID_TOP  # Account for timer space
         
         if 0 <= grid_x < GRID_WIDTH and 0 <= grid_y < GRID_HEIGHT:
             col = grid_x // CELL_SIZE
@@ -204,13 +152,26 @@ class MiniSudoku:
     
     def handle_key(self, key: int):
         """Handle keyboard input"""
-        if self.game_over or self.game_won or not self.selected_cell:
+        if self.engine.game_over or self.engine.game_won:
+            return
+        
+        if key == pygame.K_u:
+            self.engine.undo()
+            return
+        elif key == pygame.K_y:
+            self.engine.redo()
+            return
+        elif key == pygame.K_p:
+            self.pencil_mode = not self.pencil_mode
+            return
+        
+        if not self.selected_cell:
             return
         
         row, col = self.selected_cell
         
         # Check if cell is editable (not original)
-        if self.original_board[row][col] != 0:
+        if not self.engine.is_editable(row, col):
             return
         
         if pygame.K_1 <= key <= pygame.K_4:
@@ -233,226 +194,221 @@ class MiniSudoku:
             self.reset_board()
     
     def make_move(self, row: int, col: int, num: int):
-        """Make a move on the board"""
-        if self.original_board[row][col] != 0:
-            return
-        
-        old_num = self.board[row][col]
-        self.board[row][col] = num
-        
-        # Check if move is valid
-        if num != 0 and not self.is_valid_move(self.board, row, col, num):
-            self.mistakes += 1
-            if self.mistakes >= self.max_mistakes:
-                self.game_over = True
-        
-        # Check for win
-        if self.check_win():
-            self.game_won = True
+        """Make a move on the board, or toggle a pencil mark in pencil mode"""
+        if self.pencil_mode and num != 0:
+            self.engine.toggle_pencil(row, col, num)
+        else:
+            self.engine.make_move(row, col, num)
     
     def provide_hint(self):
         """Provide a hint by filling in one correct number"""
-        if self.game_over or self.game_won:
-            return
-        
-        # Find an empty cell
-        empty_cells = []
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                if self.board[row][col] == 0:
-                    empty_cells.append((row, col))
-        
-        if empty_cells:
-            row, col = random.choice(empty_cells)
-            self.board[row][col] = self.solution[row][col]
-            
-            # Check for win
-            if self.check_win():
-                self.game_won = True
+        self.engine.provide_hint()
     
     def reset_board(self):
         """Reset board to original puzzle"""
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                self.board[row][col] = self.original_board[row][col]
-        self.mistakes = 0
-        self.game_over = False
-        self.game_won = False
+        self.engine.reset_board()
         self.selected_cell = None
     
-    def draw(self):
-        """Draw the game"""
-        self.window.fill(BG_COLOR)
-        
-        # Draw timer
-        self.elapsed_time = int(time.time() - self.start_time)
-        minutes = self.elapsed_time // 60
-        seconds = self.elapsed_time % 60
-        timer_text = f"Time: {minutes:02d}:{seconds:02d}"
-        timer_surface = self.timer_font.render(timer_text, True, BLUE)
-        self.window.blit(timer_surface, (MARGIN, 10))
-        
-        # Draw mistakes
-        mistakes_text = f"Mistakes: {self.mistakes}/{self.max_mistakes}"
-        mistakes_color = RED if self.mistakes > 0 else BLACK
-        mistakes_surface = self.timer_font.render(mistakes_text, True, mistakes_color)
-        self.window.blit(mistakes_surface, (WINDOW_WIDTH - MARGIN - 150, 10))
+    def build_background(self, pencil_mode: bool) -> pygame.Surface:
+        """Render the parts of the window that only change with the input mode"""
+        background = pygame.Surface(self.window.get_size())
+        background.fill(BG_COLOR)
         
         # Draw grid background
-        grid_rect = pygame.Rect(MARGIN, MARGIN + 30, GRID_WIDTH, GRID_HEIGHT)
-        pygame.draw.rect(self.window, WHITE, grid_rect)
-        pygame.draw.rect(self.window, GRID_COLOR, grid_rect, 3)
+        grid_rect = pygame.Rect(MARGIN, GRID_TOP, GRID_WIDTH, GRID_HEIGHT)
+        pygame.draw.rect(background, WHITE, grid_rect)
+        pygame.draw.rect(background, GRID_COLOR, grid_rect, 3)
         
-        # Draw grid lines and numbers
+        # Draw grid lines
         for row in range(GRID_SIZE + 1):
             # Draw horizontal lines
-            y = MARGIN + 30 + row * CELL_SIZE
+            y = GRID_TOP + row * CELL_SIZE
             line_width = 3 if row % 2 == 0 else 1
-            pygame.draw.line(self.window, GRID_COLOR, 
+            pygame.draw.line(background, GRID_COLOR, 
                            (MARGIN, y), (MARGIN + GRID_WIDTH, y), line_width)
             
             # Draw vertical lines
             x = MARGIN + row * CELL_SIZE
             line_width = 3 if row % 2 == 0 else 1
-            pygame.draw.line(self.window, GRID_COLOR,
-                           (x, MARGIN + 30), (x, MARGIN + 30 + GRID_HEIGHT), line_width)
+            pygame.draw.line(background, GRID_COLOR,
+                           (x, GRID_TOP), (x, GRID_TOP + GRID_HEIGHT), line_width)
+        
+        # Draw controls title
+        controls_title = self.small_font.render("Controls", True, BLUE)
+        background.blit(controls_title, (CONTROL_X, GRID_TOP))
+        
+        # Draw control instructions, spaced to end above the palette title
+        for i, text in enumerate(CONTROLS):
+            y_pos = GRID_TOP + 36 + i * 24
+            text_surface = self.small_font.render(text, True, BLACK)
+            background.blit(text_surface, (CONTROL_X, y_pos))
+        
+        # Draw numbers palette title
+        palette_title = self.small_font.render(
+            "Click to pencil:" if pencil_mode else "Click to select:", True, BLUE)
+        background.blit(palette_title, (CONTROL_X, PALETTE_Y))
+        return background
+    
+    def build_palette_tile(self, num: int, highlighted: bool) -> pygame.Surface:
+        """Render one number palette entry"""
+        tile = pygame.Surface((40, 40))
+        tile.fill(YELLOW if highlighted else WHITE)
+        pygame.draw.rect(tile, BLUE, tile.get_rect(), 2)
+        glyph = self.render_cache.glyph(self.font, BLUE, num)
+        tile.blit(glyph, glyph.get_rect(center=tile.get_rect().center))
+        return tile
+    
+    def build_button(self, text: str, color: Tuple[int, int, int]) -> pygame.Surface:
+        """Render a rounded button with a label"""
+        button = pygame.Surface((180, 40), pygame.SRCALPHA)
+        rect = button.get_rect()
+        pygame.draw.rect(button, color, rect, border_radius=5)
+        pygame.draw.rect(button, BLACK, rect, 2, border_radius=5)
+        label = self.small_font.render(text, True, WHITE)
+        button.blit(label, label.get_rect(center=rect.center))
+        return button
+    
+    def draw(self):
+        """Draw the game"""
+        engine = self.engine
+        cache = self.render_cache
+        window = self.window
+        cache.validate((window.get_size(), engine.size))
+        pencil_mode = self.pencil_mode
+        window.blit(cache.layer(('background', pencil_mode),
+                                lambda: self.build_background(pencil_mode)), (0, 0))
+        
+        # Draw timer
+        elapsed_time = engine.update_elapsed_time()
+        minutes = elapsed_time // 60
+        seconds = elapsed_time % 60
+        timer_text = f"Time: {minutes:02d}:{seconds:02d}"
+        window.blit(cache.text(self.timer_font, BLUE, timer_text), (MARGIN, 10))
+        
+        # Draw mistakes
+        mistakes_text = f"Mistakes: {engine.mistakes}/{engine.max_mistakes}"
+        mistakes_color = RED if engine.mistakes > 0 else BLACK
+        window.blit(cache.text(self.timer_font, mistakes_color, mistakes_text),
+                    (WINDOW_WIDTH - MARGIN - 150, 10))
         
         # Draw numbers and highlight conflicts
         conflicts = []
+        selected_num = 0
         if self.selected_cell:
             row, col = self.selected_cell
-            if self.board[row][col] != 0:
-                conflicts = self.get_conflicts(row, col, self.board[row][col])
+            selected_num = engine.board[row, col]
+            if selected_num != 0:
+                conflicts = engine.get_conflicts(row, col, selected_num)
         
         for row in range(GRID_SIZE):
             for col in range(GRID_SIZE):
-                cell_rect = pygame.Rect(
-                    MARGIN + col * CELL_SIZE,
-                    MARGIN + 30 + row * CELL_SIZE,
-                    CELL_SIZE, CELL_SIZE
-                )
+                cell_rect = self.cell_rect(row, col)
+                original = engine.original_board[row, col] != 0
                 
                 # Highlight selected cell
                 if self.selected_cell == (row, col):
-                    pygame.draw.rect(self.window, SELECTED_COLOR, cell_rect)
+                    window.fill(SELECTED_COLOR, cell_rect)
                 
                 # Highlight conflicting cells
                 elif (row, col) in conflicts:
-                    pygame.draw.rect(self.window, CONFLICT_COLOR, cell_rect)
+                    window.fill(CONFLICT_COLOR, cell_rect)
                 
                 # Highlight original numbers
-                elif self.original_board[row][col] != 0:
-                    pygame.draw.rect(self.window, LIGHT_BLUE, cell_rect)
+                elif original:
+                    window.fill(LIGHT_BLUE, cell_rect)
                 
                 # Draw number
-                num = self.board[row][col]
+                num = engine.board[row, col]
                 if num != 0:
-                    color = BLUE if self.original_board[row][col] != 0 else BLACK
-                    num_surface = self.font.render(str(num), True, color)
-                    num_rect = num_surface.get_rect(center=cell_rect.center)
-                    self.window.blit(num_surface, num_rect)
-        
-        # Draw control panel
-        control_x = MARGIN + GRID_WIDTH + 20
-        control_y = MARGIN + 30
-        
-        # Draw controls title
-        controls_title = self.small_font.render("Controls", True, BLUE)
-        self.window.blit(controls_title, (control_x, control_y))
-        
-        # Draw control instructions
-        controls = [
-            "1-4: Place number",
-            "DEL: Clear cell",
-            "Arrows: Move",
-            "SPACE: Get hint",
-            "R: Reset puzzle",
-            "N: New puzzle",
-            "ESC: Quit"
-        ]
-        
-        for i, text in enumerate(controls):
-            y_pos = control_y + 40 + i * 35
-            text_surface = self.small_font.render(text, True, BLACK)
-            self.window.blit(text_surface, (control_x, y_pos))
+                    glyph = cache.glyph(self.font, BLUE if original else BLACK, num)
+                    window.blit(glyph, glyph.get_rect(center=cell_rect.center))
+                else:
+                    self.draw_pencil_marks(row, col, cell_rect)
         
         # Draw numbers palette
-        palette_y = control_y + 280
-        palette_title = self.small_font.render("Click to select:", True, BLUE)
-        self.window.blit(palette_title, (control_x, palette_y))
-        
         for i in range(GRID_SIZE):
             num = i + 1
-            palette_rect = pygame.Rect(control_x + i * 45, palette_y + 30, 40, 40)
+            palette_rect = pygame.Rect(CONTROL_X + i * 45, PALETTE_Y + 30, 40, 40)
             
             # Highlight if this number is selected
-            if self.selected_cell:
-                row, col = self.selected_cell
-                if self.board[row][col] == num:
-                    pygame.draw.rect(self.window, YELLOW, palette_rect)
-                else:
-                    pygame.draw.rect(self.window, WHITE, palette_rect)
-            else:
-                pygame.draw.rect(self.window, WHITE, palette_rect)
-            
-            pygame.draw.rect(self.window, BLUE, palette_rect, 2)
-            num_surface = self.font.render(str(num), True, BLUE)
-            num_rect = num_surface.get_rect(center=palette_rect.center)
-            self.window.blit(num_surface, num_rect)
+            highlighted = num == selected_num
+            tile = cache.layer(('palette', num, highlighted),
+                               lambda: self.build_palette_tile(num, highlighted))
+            window.blit(tile, palette_rect)
             
             # Store palette position for click detection
             self.palette_rects[num] = palette_rect
         
         # Draw game status
-        status_y = WINDOW_HEIGHT - 100
-        if self.game_won:
-            status_text = "Congratulations! You won!"
-            status_color = GREEN
-            status_surface = self.timer_font.render(status_text, True, status_color)
-            self.window.blit(status_surface, (MARGIN, status_y))
+        if engine.game_won:
+            status_surface = cache.text(self.timer_font, GREEN, "Congratulations! You won!")
+            window.blit(status_surface, (MARGIN, STATUS_Y))
             
             # Draw restart button
-            restart_rect = pygame.Rect(WINDOW_WIDTH - 200, status_y, 180, 40)
-            pygame.draw.rect(self.window, GREEN, restart_rect, border_radius=5)
-            pygame.draw.rect(self.window, BLACK, restart_rect, 2, border_radius=5)
-            restart_text = self.small_font.render("Play Again", True, WHITE)
-            restart_text_rect = restart_text.get_rect(center=restart_rect.center)
-            self.window.blit(restart_text, restart_text_rect)
+            restart_rect = pygame.Rect(WINDOW_WIDTH - 200, STATUS_Y, 180, 40)
+            window.blit(cache.layer('play_again', lambda: self.build_button("Play Again", GREEN)),
+                        restart_rect)
             self.restart_button = restart_rect
             
-        elif self.game_over:
-            status_text = f"Game Over! Too many mistakes."
-            status_color = RED
-            status_surface = self.timer_font.render(status_text, True, status_color)
-            self.window.blit(status_surface, (MARGIN, status_y))
+        elif engine.game_over:
+            status_surface = cache.text(self.timer_font, RED, "Game Over! Too many mistakes.")
+            window.blit(status_surface, (MARGIN, STATUS_Y))
             
             # Show solution button
-            solution_rect = pygame.Rect(WINDOW_WIDTH - 200, status_y, 180, 40)
-            pygame.draw.rect(self.window, BLUE, solution_rect, border_radius=5)
-            pygame.draw.rect(self.window, BLACK, solution_rect, 2, border_radius=5)
-            solution_text = self.small_font.render("Show Solution", True, WHITE)
-            solution_text_rect = solution_text.get_rect(center=solution_rect.center)
-            self.window.blit(solution_text, solution_text_rect)
+            solution_rect = pygame.Rect(WINDOW_WIDTH - 200, STATUS_Y, 180, 40)
+            window.blit(cache.layer('show_solution', lambda: self.build_button("Show Solution", BLUE)),
+                        solution_rect)
             self.solution_button = solution_rect
             
             # Restart button
-            restart_rect = pygame.Rect(WINDOW_WIDTH - 200, status_y + 50, 180, 40)
-            pygame.draw.rect(self.window, GREEN, restart_rect, border_radius=5)
-            pygame.draw.rect(self.window, BLACK, restart_rect, 2, border_radius=5)
-            restart_text = self.small_font.render("Try Again", True, WHITE)
-            restart_text_rect = restart_text.get_rect(center=restart_rect.center)
-            self.window.blit(restart_text, restart_text_rect)
+            restart_rect = pygame.Rect(WINDOW_WIDTH - 200, STATUS_Y + 50, 180, 40)
+            window.blit(cache.layer('try_again', lambda: self.build_button("Try Again", GREEN)),
+                        restart_rect)
             self.restart_button = restart_rect
         
         # Draw new puzzle button
-        new_button_rect = pygame.Rect(control_x, WINDOW_HEIGHT - 60, 180, 40)
-        pygame.draw.rect(self.window, BLUE, new_button_rect, border_radius=5)
-        pygame.draw.rect(self.window, BLACK, new_button_rect, 2, border_radius=5)
-        new_text = self.small_font.render("New Puzzle (N)", True, WHITE)
-        new_text_rect = new_text.get_rect(center=new_button_rect.center)
-        self.window.blit(new_text, new_text_rect)
+        new_button_rect = pygame.Rect(CONTROL_X, WINDOW_HEIGHT - 60, 180, 40)
+        window.blit(cache.layer('new_puzzle', lambda: self.build_button("New Puzzle (N)", BLUE)),
+                    new_button_rect)
         self.new_button = new_button_rect
     
+    def draw_pencil_marks(self, row: int, col: int, cell_rect: pygame.Rect):
+        """Draw a cell's pencil marks, each digit in its own corner of the cell"""
+        engine = self.engine
+        box_size = engine.box_size
+        step = CELL_SIZE // box_size
+        for num in engine.get_pencil_marks(row, col):
+            i, j = divmod(num - 1, box_size)
+            center = (cell_rect.x + j * step + step // 2, cell_rect.y + i * step + step // 2)
+            glyph = self.render_cache.glyph(self.pencil_font, PENCIL_COLOR, num)
+            self.window.blit(glyph, glyph.get_rect(center=center))
+    
+    def draw_profiler(self):
+        """Draw frame time statistics and a graph of recent frames"""
+        summary = self.profiler.summary()
+        panel = pygame.Surface(PROFILER_RECT.size, pygame.SRCALPHA)
+        panel.fill(PROFILER_BG)
+        font = self.profiler_font
+        lines = [
+            f"FPS {summary.fps:.0f}   frames {summary.frames}",
+            f"frame ms  p50 {summary.p50:.2f}  p95 {summary.p95:.2f}  p99 {summary.p99:.2f}",
+            "  ".join(f"{name} {ms:.2f}" for name, ms in zip(PHASE_NAMES, summary.phases)),
+        ]
+        # Rendered directly: these change every frame and would only push
+        # the timer and status strings out of the render cache
+        for i, line in enumerate(lines):
+            panel.blit(font.render(line, True, PROFILER_TEXT), (6, 4 + i * 18))
+        
+        # One bar per frame, scaled so a 60 FPS budget is half the height
+        graph = pygame.Rect(6, 62, PROFILER_RECT.width - 12, PROFILER_RECT.height - 68)
+        budget = 1000 / 60
+        totals = self.profiler.recent_totals(graph.width // 2)
+        for i, ms in enumerate(totals):
+            height = min(graph.height, max(1, int(ms / (2 * budget) * graph.height)))
+            color = PROFILER_SLOW_BAR if ms > budget else PROFILER_BAR
+            panel.fill(color, (graph.x + i * 2, graph.bottom - height, 1, height))
+        self.window.blit(panel, PROFILER_RECT)
+    
     def handle_palette_click(self, pos: Tuple[int, int]):
         """Handle click on number palette"""
         for num, rect in self.palette_rects.items():
@@ -465,52 +421,228 @@ class MiniSudoku:
     
     def show_solution(self):
         """Show the complete solution"""
-        self.board = [row[:] for row in self.solution]
+        self.engine.show_solution()
+    
+    def view_state(self) -> Tuple:
+        """Snapshot everything on screen that events can change"""
+        engine = self.engine
+        conflicts = ()
+        if self.selected_cell:
+            row, col = self.selected_cell
+            if engine.board[row, col] != 0:
+                conflicts = tuple(engine.get_conflicts(row, col, engine.board[row, col]))
+        return (
+            self.selected_cell,
+            engine.board.copy(),
+            engine.pencil_marks[:],
+            frozenset(conflicts),
+            engine.mistakes,
+            engine.game_won,
+            engine.game_over,
+            engine.update_elapsed_time(),
+            self.pencil_mode,
+        )
+    
+    def cell_rect(self, row: int, col: int) -> pygame.Rect:
+        """Get the screen rectangle of a grid cell"""
+        return pygame.Rect(MARGIN + col * CELL_SIZE, GRID_TOP + row * CELL_SIZE,
+                           CELL_SIZE, CELL_SIZE)
+    
+    def dirty_rects(self, before: Tuple, after: Tuple) -> List[pygame.Rect]:
+        """Get the screen regions that differ between two view states"""
+        if self.needs_full_redraw:
+            self.needs_full_redraw = False
+            return [self.window.get_rect()]
+        
+        (old_selected, old_board, old_marks, old_conflicts, old_mistakes,
+         old_won, old_over, old_time, old_pencil_mode) = before
+        selected, board, marks, conflicts, mistakes, won, over, elapsed, pencil_mode = after
+        if pencil_mode != old_pencil_mode:
+            # The palette title in the background layer names the mode
+            return [self.window.get_rect()]
+        
+        cells = set()
+        if selected != old_selected:
+            cells.update(cell for cell in (old_selected, selected) if cell)
+        if board != old_board:
+            cells.update(divmod(pos, GRID_SIZE) for pos in board.diff(old_board))
+        if marks != old_marks:
+            cells.update(divmod(pos, GRID_SIZE) for pos in range(len(marks))
+                         if marks[pos] != old_marks[pos])
+        cells.update(conflicts ^ old_conflicts)
+        
+        rects = [self.cell_rect(row, col) for row, col in cells]
+        if cells:
+            # The palette highlights the selected cell's number
+            rects.append(PALETTE_RECT)
+        if mistakes != old_mistakes:
+            rects.append(MISTAKES_RECT)
+        if won != old_won or over != old_over:
+            rects.append(STATUS_RECT)
+        if elapsed != old_time:
+            rects.append(TIMER_RECT)
+        return rects
     
-    def run(self):
-        """Main game loop"""
+    def handle_event(self, event: pygame.event.Event) -> bool:
+        """Handle one event, returning False when the game should quit"""
+        if event.type == pygame.QUIT:
+            return False
+        
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            if event.button == 1:  # Left click
+                # Handle grid click
+                self.handle_click(event.pos)
+                
+                # Handle palette click
+                if not self.handle_palette_click(event.pos):
+                    # Handle button clicks
+                    if self.restart_button and self.restart_button.collidepoint(event.pos):
+                        self.reset_game()
+                    elif self.solution_button and self.solution_button.collidepoint(event.pos):
+                        self.show_solution()
+                    elif self.new_button and self.new_button.collidepoint(event.pos):
+                        self.reset_game()
+        
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                return False
+            elif event.key == pygame.K_n:
+                self.reset_game()
+            elif event.key == pygame.K_F3:
+                self.show_profiler = not self.show_profiler
+                self.needs_full_redraw = True
+            else:
+                self.handle_key(event.key)
+        
+        elif event.type == pygame.VIDEORESIZE:
+            self.render_cache.invalidate()
+            self.needs_full_redraw = True
+        
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            self.needs_full_redraw = True
+        
+        elif event.type == TIMER_EVENT:
+            if self.recorder is not None:
+                # Moves only sync on a later write, so an idle player's
+                # last moves are synced here once the interval is up
+                self.recorder.maybe_sync()
+        
+        return True
+    
+    def run(self, profile_dump: Optional[str] = None):
+        """Main game loop
+        
+        Sleeps in pygame.event.wait until something happens, with a
+        once-per-second timer event driving the clock, and pushes only the
+        regions that changed to the display.  Each frame after the wait is
+        timed by phase; F3 shows the timings, and profile_dump saves them
+        as CSV on exit.
+        """
         self.palette_rects = {}
         self.restart_button = None
         self.solution_button = None
         self.new_button = None
-        
+        profiler = self.profiler
+        
+        pygame.time.set_timer(TIMER_EVENT, 1000)
+        first_frame_start = time.perf_counter()
+        self.draw()
+        pygame.display.flip()
+        self.startup_times['first frame'] = time.perf_counter() - first_frame_start
+        if self.report_startup:
+            print("Startup: " + ", ".join(f"{name} {seconds * 1000:.1f}ms"
+                                          for name, seconds in self.startup_times.items()),
+                  file=sys.stderr)
+        
+        state = self.view_state()
         running = True
         while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
+            events = [pygame.event.wait()]
+            events.extend(pygame.event.get())
+            profiler.begin_frame()
+            for event in events:
+                if not self.handle_event(event):
                     running = False
-                
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if event.button == 1:  # Left click
-                        # Handle grid click
-                        self.handle_click(event.pos)
-                        
-                        # Handle palette click
-                        if not self.handle_palette_click(event.pos):
-                            # Handle button clicks
-                            if self.restart_button and self.restart_button.collidepoint(event.pos):
-                                self.reset_game()
-                            elif self.solution_button and self.solution_button.collidepoint(event.pos):
-                                self.show_solution()
-                            elif self.new_button and self.new_button.collidepoint(event.pos):
-                                self.reset_game()
-                
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        running = False
-                    elif event.key == pygame.K_n:
-                        self.reset_game()
-                    else:
-                        self.handle_key(event.key)
-            
-            self.draw()
-            pygame.display.flip()
-            self.clock.tick(FPS)
-        
+                    break
+            else:
+                profiler.mark(PHASE_EVENTS)
+                new_state = self.view_state()
+                dirty = self.dirty_rects(state, new_state)
+                state = new_state
+                if self.show_profiler:
+                    dirty.append(PROFILER_RECT)
+                profiler.mark(PHASE_STATE)
+                if dirty:
+                    self.draw()
+                    if self.show_profiler:
+                        self.draw_profiler()
+                    profiler.mark(PHASE_DRAW)
+                    pygame.display.update(dirty)
+                    profiler.mark(PHASE_PRESENT)
+                profiler.end_frame()
+        
+        if profile_dump:
+            profiler.dump(profile_dump)
         pygame.quit()
         sys.exit()
 
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Play Mini Sudoku")
+    parser.add_argument('--bank', help="draw new puzzles from a pre-generated puzzle bank")
+    parser.add_argument('--prefetch', type=int, default=DEFAULT_DEPTH, metavar='DEPTH',
+                        help="puzzles to generate ahead in the background (0 disables)")
+    parser.add_argument('--refill-at', type=int, default=DEFAULT_REFILL_AT,
+                        help="refill the prefetch queue when it drops to this many puzzles")
+    parser.add_argument('--session', metavar='PATH',
+                        help="record the game to a session file, resuming an unfinished one")
+    parser.add_argument('--puzzle', metavar='ID', help="play the puzzle with this ID")
+    parser.add_argument('--daily', type=parse_difficulty, metavar='DIFFICULTY',
+                        help="play today's puzzle at this difficulty")
+    parser.add_argument('--profile', action='store_true',
+                        help="start with the frame profiler overlay shown (toggle with F3)")
+    parser.add_argument('--profile-dump', metavar='PATH',
+                        help="write the frame timings as CSV on exit")
+    parser.add_argument('--startup-times', action='store_true',
+                        help="print import, init and first-frame times to stderr")
+    parser.add_argument('--font-cache', metavar='PATH',
+                        help="where to cache resolved font files (default: under ~/.cache)")
+    args = parser.parse_args(argv)
+    if args.prefetch < 0:
+        parser.error(f"--prefetch must be 0 or more, got {args.prefetch}")
+    if args.prefetch > 0 and not 0 <= args.refill_at < args.prefetch:
+        parser.error(f"--refill-at must be between 0 and {args.prefetch - 1}, "
+                     f"got {args.refill_at}")
+
+    puzzle_source = None
+    if args.bank:
+        puzzle_source = PuzzleBank(args.bank).random_puzzle
+    elif args.prefetch > 0:
+        puzzle_source = PuzzlePrefetcher(GRID_SIZE, args.prefetch, args.refill_at).start()
+    puzzle_id = args.puzzle
+    if args.daily is not None:
+        puzzle_id = daily_puzzle_id(datetime.date.today(), GRID_SIZE, args.daily)
+    if puzzle_id is not None:
+        try:
+            parsed = parse_puzzle_id(puzzle_id)
+        except ValueError as e:
+            parser.error(str(e))
+        puzzle_id = format_puzzle_id(*parsed)
+        if parsed.size != GRID_SIZE:
+            parser.error(f"puzzle {puzzle_id} is not a {GRID_SIZE}x{GRID_SIZE} puzzle")
+    game = MiniSudoku(puzzle_source, show_profiler=args.profile,
+                      report_startup=args.startup_times, font_cache=args.font_cache)
+    if puzzle_id is not None:
+        game.start_puzzle_id(puzzle_id)
+    if args.session:
+        with SessionRecorder(args.session) as recorder:
+            # A requested puzzle starts a new game rather than resuming
+            if recorder.attach(game.engine, resume=puzzle_id is None):
+                game.update_caption()
+            game.recorder = recorder
+            game.run(args.profile_dump)
+    else:
+        game.run(args.profile_dump)
+
 if __name__ == "__main__":
-    game = MiniSudoku()
-    game.run()
+    main()
 
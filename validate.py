@@ -0,0 +1,202 @@
+"""Vectorized checks for whole puzzle corpora with NumPy.
+
+Boards come in as an (M, N, N) or (M, N * N) uint8 array and are checked
+a chunk at a time, so memory stays bounded however many boards there are.
+For every board the checks report:
+
+    valid       every digit is in range and no unit repeats one
+    complete    no cell is empty
+    conflicts   surplus copies of digits within units, counted the same
+                way as ConstraintTracker.conflicts
+
+Each unit's digits are OR-ed into a bitmask across the whole chunk at
+once; the surplus copies are the filled cells less the distinct digits.
+check_solutions additionally confirms that each claimed solution is a
+valid, complete board that agrees with its puzzle's givens.
+
+Corpora can be read from batch output or from a puzzle bank::
+
+    python validate.py puzzles.txt
+    python validate.py puzzles.bank
+"""
+import argparse
+import sys
+import time
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from bank import MAGIC, PuzzleBank, digit_bits, record_size
+from board import box_size_of
+from generator import DIFFICULTY_NAMES, DIGITS
+
+DEFAULT_CHUNK_SIZE = 1 << 12
+
+
+class BoardReport(NamedTuple):
+    """Per-board results of validate_boards"""
+    valid: np.ndarray
+    complete: np.ndarray
+    conflicts: np.ndarray
+
+
+@lru_cache(maxsize=None)
+def unit_cells(size: int) -> np.ndarray:
+    """Get the flat cell positions of every row, column and box, shape (3N, N)"""
+    box_size = box_size_of(size)
+    grid = np.arange(size * size).reshape(size, size)
+    boxes = (grid.reshape(box_size, box_size, box_size, box_size)
+             .transpose(0, 2, 1, 3).reshape(size, size))
+    return np.concatenate([grid, grid.T, boxes])
+
+
+def _flat(boards: np.ndarray) -> Tuple[np.ndarray, int]:
+    """Reshape boards to (M, N * N) and work out the grid size"""
+    boards = np.asarray(boards)
+    if boards.ndim == 3:
+        if boards.shape[1] != boards.shape[2]:
+            raise ValueError(f"boards must be square, got shape {boards.shape}")
+        size = boards.shape[1]
+        return boards.reshape(len(boards), size * size), size
+    if boards.ndim == 2:
+        size = int(round(boards.shape[1] ** 0.5))
+        if size * size != boards.shape[1]:
+            raise ValueError(f"{boards.shape[1]} cells is not a square grid")
+        return boards, size
+    raise ValueError(f"expected (M, N, N) or (M, N * N) boards, got shape {boards.shape}")
+
+
+def _check_chunk(chunk: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Validate one (M, N * N) chunk"""
+    in_range = (chunk <= size).all(axis=1)
+    complete = (chunk != 0).all(axis=1)
+    if not in_range.all():
+        chunk = np.where(chunk <= size, chunk, 0)
+    filled = np.count_nonzero(chunk, axis=1)
+
+    # Board-minor layout keeps every OR below a contiguous sweep over the chunk
+    dtype = np.uint16 if size < 16 else np.uint32
+    bits = np.left_shift(dtype(1), np.ascontiguousarray(chunk.T), dtype=dtype)
+    units = unit_cells(size)
+    masks = bits[units[:, 0]]
+    for i in range(1, size):
+        masks |= bits[units[:, i]]
+    # Each filled cell lies in three units; the copies beyond the first of
+    # a digit are whatever the unit masks do not account for
+    distinct = np.bitwise_count(masks >> 1).sum(axis=0, dtype=np.int64)
+    conflicts = 3 * filled - distinct
+    return in_range & (conflicts == 0), complete, conflicts
+
+
+def validate_boards(boards: np.ndarray, chunk_size: int = DEFAULT_CHUNK_SIZE) -> BoardReport:
+    """Check every board for rule violations and empty cells"""
+    flat, size = _flat(boards)
+    count = len(flat)
+    valid = np.empty(count, dtype=bool)
+    complete = np.empty(count, dtype=bool)
+    conflicts = np.empty(count, dtype=np.int64)
+    for start in range(0, count, chunk_size):
+        stop = min(start + chunk_size, count)
+        valid[start:stop], complete[start:stop], conflicts[start:stop] = _check_chunk(
+            flat[start:stop], size)
+    return BoardReport(valid, complete, conflicts)
+
+
+def check_solutions(puzzles: np.ndarray, solutions: np.ndarray,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+    """Check that each solution is solved and keeps its puzzle's givens"""
+    puzzles, size = _flat(puzzles)
+    solutions, solution_size = _flat(solutions)
+    if puzzles.shape != solutions.shape or size != solution_size:
+        raise ValueError(f"{puzzles.shape} puzzles do not match {solutions.shape} solutions")
+    count = len(puzzles)
+    consistent = np.empty(count, dtype=bool)
+    for start in range(0, count, chunk_size):
+        stop = min(start + chunk_size, count)
+        puzzle = puzzles[start:stop]
+        solution = solutions[start:stop]
+        valid, complete, _ = _check_chunk(solution, size)
+        givens_kept = ((puzzle == 0) | (puzzle == solution)).all(axis=1)
+        consistent[start:stop] = valid & complete & givens_kept
+    return consistent
+
+
+def read_text(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Read ``puzzle solution`` lines written by batch.py into two arrays"""
+    lookup = np.full(256, 255, dtype=np.uint8)
+    for num, char in enumerate(DIGITS):
+        lookup[ord(char)] = num
+        lookup[ord(char.lower())] = num
+    with open(path, 'rb') as f:
+        lines = f.read().split()
+    if not lines:
+        return np.zeros((0, 0), np.uint8), np.zeros((0, 0), np.uint8)
+    width = len(lines[0])
+    if len(lines) % 2 or any(len(line) != width for line in lines):
+        raise ValueError(f"{path} is not a list of puzzle and solution lines")
+    cells = lookup[np.frombuffer(b''.join(lines), dtype=np.uint8)].reshape(-1, 2, width)
+    return cells[:, 0], cells[:, 1]
+
+
+def read_bank(bank: PuzzleBank, size: int, difficulty: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Unpack every puzzle of one size and difficulty from a bank into two arrays"""
+    cell_count = size * size
+    bits = digit_bits(size)
+    length = record_size(size)
+    records = np.concatenate([np.frombuffer(data, dtype=np.uint8).reshape(-1, length)
+                              for data in bank.segment_data(size, difficulty)]
+                             or [np.zeros((0, length), np.uint8)])
+    record_bits = np.unpackbits(records, axis=1, bitorder='little')
+    givens = record_bits[:, :cell_count].astype(bool)
+    digits = record_bits[:, cell_count:cell_count + cell_count * bits].reshape(-1, cell_count, bits)
+    solutions = (digits @ (1 << np.arange(bits))).astype(np.uint8) + 1
+    puzzles = np.where(givens, solutions, 0).astype(np.uint8)
+    return puzzles, solutions
+
+
+def summarize(name: str, puzzles: np.ndarray, solutions: np.ndarray,
+              chunk_size: int) -> Tuple[bool, List[str]]:
+    """Validate one corpus, returning whether it passed and a description"""
+    start = time.perf_counter()
+    puzzle_report = validate_boards(puzzles, chunk_size)
+    consistent = check_solutions(puzzles, solutions, chunk_size)
+    elapsed = time.perf_counter() - start
+    count = len(puzzles)
+    rate = count / elapsed if elapsed > 0 else 0.0
+    lines = [f"{name}: {count} puzzles checked in {elapsed:.3f}s ({rate:.0f}/sec)",
+             f"  invalid puzzles: {count - int(puzzle_report.valid.sum())}",
+             f"  conflicts: {int(puzzle_report.conflicts.sum())}",
+             f"  inconsistent solutions: {count - int(consistent.sum())}"]
+    bad = np.flatnonzero(~(puzzle_report.valid & consistent))
+    if len(bad):
+        lines.append(f"  first bad puzzles: {', '.join(str(i) for i in bad[:10])}")
+    return not len(bad), lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Validate a corpus of puzzles")
+    parser.add_argument('path', help="batch output file or puzzle bank")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    with open(args.path, 'rb') as f:
+        is_bank = f.read(len(MAGIC)) == MAGIC
+    passed = True
+    if is_bank:
+        with PuzzleBank(args.path) as bank:
+            for size, difficulty in bank.keys():
+                puzzles, solutions = read_bank(bank, size, difficulty)
+                ok, lines = summarize(f"{size}x{size} {DIFFICULTY_NAMES[difficulty]}",
+                                      puzzles, solutions, args.chunk_size)
+                passed = passed and ok
+                print('\n'.join(lines))
+    else:
+        puzzles, solutions = read_text(args.path)
+        passed, lines = summarize(args.path, puzzles, solutions, args.chunk_size)
+        print('\n'.join(lines))
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())